@@ -0,0 +1,121 @@
+"""
+reports resident bytes per setting for a loaded dump, comparing the old representation
+(a plain dataclass per setting with lists, plus the file kept as readlines()) with the current
+slotted BIOSSetting with interned strings and option label ids, plus the file kept as one string.
+
+usage: python benchmarks/bench_memory.py path/to/nvram.txt [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nvram_parser  # noqa: E402
+
+
+@dataclass
+class LegacySetting:
+    """the BIOSSetting layout before it was slotted, kept here only to measure against"""
+    setup_question: str = ""
+    help_string: str = ""
+    token: str = ""
+    offset: str = ""
+    width: str = ""
+    bios_default: Optional[str] = None
+    options: List[str] = None
+    active_option: Optional[int] = None
+    value: Optional[str] = None
+    content: List[str] = None
+
+
+def legacy_load(path: str, encoding: str):
+    """loads a dump the way _load_file used to: readlines() and one dict-backed object with fresh strings per field"""
+    with open(path, 'r', encoding=encoding) as f:
+        lines = f.readlines()
+    settings = []
+    current = None
+    for raw_line in lines:
+        line = nvram_parser.strip_comment(raw_line)
+        if not line:
+            continue
+        kind = nvram_parser.line_kind(line)
+        if kind == nvram_parser.SETUP_QUESTION:
+            current = LegacySetting(setup_question=line[line.find('=') + 1:].strip(), options=[], content=[])
+            settings.append(current)
+            continue
+        if current is None:
+            continue
+        if kind is None:
+            if nvram_parser.is_option_line(line):
+                active = nvram_parser.parse_options_line(line, current.options)
+                current.active_option = active if active is not None else current.active_option
+            else:
+                current.content.append(line)
+            continue
+        rest = line[line.find('=') + 1:].strip()
+        if kind == nvram_parser.OPTIONS:
+            active = nvram_parser.parse_options_line(rest, current.options)
+            current.active_option = active if active is not None else current.active_option
+        else:
+            field = {
+                nvram_parser.HELP_STRING: 'help_string',
+                nvram_parser.TOKEN: 'token',
+                nvram_parser.OFFSET: 'offset',
+                nvram_parser.WIDTH: 'width',
+                nvram_parser.BIOS_DEFAULT: 'bios_default',
+                nvram_parser.VALUE: 'value',
+            }[kind]
+            setattr(current, field, rest)
+    return lines, settings
+
+
+def current_load(path: str, encoding: str):
+    text = nvram_parser.read_text(path, encoding)
+    return text, list(nvram_parser.parse_text(text))
+
+
+def measure(load, path: str, encoding: str):
+    gc.collect()
+    tracemalloc.start()
+    source, settings = load(path, encoding)
+    total = tracemalloc.get_traced_memory()[0]
+    del source
+    gc.collect()
+    settings_only = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = max(len(settings), 1)
+    return {
+        'settings': len(settings),
+        'bytes_per_setting': round(settings_only / count),
+        'bytes_per_setting_with_source': round(total / count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--encoding', default=nvram_parser.DEFAULT_ENCODING)
+    parser.add_argument('--json', action='store_true', help="print machine readable results")
+    args = parser.parse_args()
+
+    before = measure(legacy_load, args.path, args.encoding)
+    after = measure(current_load, args.path, args.encoding)
+    if args.json:
+        print(json.dumps({'before': before, 'after': after}, indent=2))
+        return
+    print(f"{before['settings']} settings in {args.path}")
+    for name, result in (('before', before), ('after', after)):
+        print(f"  {name:<7}{result['bytes_per_setting']:>8} bytes/setting"
+              f"{result['bytes_per_setting_with_source']:>10} bytes/setting incl. file text")
+    saved = 1 - after['bytes_per_setting_with_source'] / max(before['bytes_per_setting_with_source'], 1)
+    print(f"  {saved:.0%} less memory per loaded dump")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+writes a synthetic nvram.txt in the layout SCEWIN / AMISCE exports, for benchmarks and round-trip checks.
+the mix of option lists, values, duplicate questions and comments follows real dumps, the output is
+the same for the same count and seed.
+
+usage: python benchmarks/generate_nvram.py COUNT OUTPUT [--seed N] [--lf]
+"""
+import argparse
+import random
+from typing import List
+
+OPTION_SETS = [
+    ["[00]Disabled", "[01]Enabled"],
+    ["[00]Disabled", "[01]Enabled", "[02]Auto"],
+    ["[00]Auto", "[01]Manual"],
+    ["[0]Disabled", "[1]Enabled"],
+    ["[00]Auto", "[01]Gen1", "[02]Gen2", "[03]Gen3", "[04]Gen4"],
+    ["[00]Disabled", "[01]C1", "[02]C2", "[03]C3", "[06]C6", "[07]C7", "[08]C8", "[0A]C10"],
+    ["[00]Legacy Only", "[01]UEFI Only", "[02]UEFI and Legacy"],
+    ["[FF]Auto"] + [f"[{i:02X}]{i}" for i in range(32)],
+]
+SUBSYSTEMS = ["CPU", "PCH", "PCIe", "USB", "SATA", "Memory", "ACPI", "Power", "Thermal", "Security",
+              "Network", "Audio", "Chipset", "Boot", "Graphics", "Overclocking"]
+FEATURES = ["C-State", "Turbo Mode", "Link Speed", "ASPM", "Hot Plug", "Port", "Controller", "Latency",
+            "Voltage Override", "Ratio Limit", "Power Limit", "Watchdog", "Virtualization", "Spread Spectrum",
+            "Clock Gating", "Wake on LAN", "Fan Control", "Debug Mode", "Prefetcher", "Fast Boot"]
+HELP_TEMPLATES = [
+    "Enables or Disables {feature} for {subsystem}.",
+    "Configure {feature} of the {subsystem} subsystem. Auto lets the BIOS decide.",
+    "{feature} setting, changing this may cause the system to become unstable.",
+    "",
+]
+ACTIVE_COMMENT = '\t// Move "*" to the desired Option'
+
+
+def _question(rng: random.Random, index: int) -> str:
+    text = f"{rng.choice(SUBSYSTEMS)} {rng.choice(FEATURES)}"
+    # most questions repeat across ports and controllers, a few carry a number
+    if rng.random() < 0.3:
+        text += f" {index % 16}"
+    return text
+
+
+def generate_lines(count: int, seed: int = 0) -> List[str]:
+    """the dump as a list of lines without line endings"""
+    rng = random.Random(seed)
+    lines = [
+        "// Script File Name : nvram.txt",
+        "// Created on 10/17/2026 at 12:00:00",
+        "// AMISCE Utility. Ver 5.05.01.0002",
+        "// Copyright (c) 2021 AMI. All rights reserved.",
+        "HIICrc32= 4C9A2B1E",
+        "",
+    ]
+    for index in range(count):
+        question = _question(rng, index)
+        subsystem, feature = question.split(' ', 1)
+        lines.append(f"Setup Question\t= {question}")
+        help_text = rng.choice(HELP_TEMPLATES).format(feature=feature, subsystem=subsystem)
+        lines.append(f"Help String\t= {help_text}")
+        lines.append(f"Token\t={index * 3 + 1:X}\t// Do NOT change this line")
+        lines.append(f"Offset\t={index * 2 % 0x10000:04X}")
+        kind = rng.random()
+        if kind < 0.7:
+            options = rng.choice(OPTION_SETS)
+            default = rng.randrange(len(options))
+            active = default if rng.random() < 0.8 else rng.randrange(len(options))
+            lines.append("Width\t=01")
+            lines.append(f"BIOS Default ={options[default]}")
+            for i, option in enumerate(options):
+                prefix = "Options\t=" if i == 0 else "         "
+                lines.append(f"{prefix}{'*' if i == active else ''}{option}{ACTIVE_COMMENT}")
+        elif kind < 0.95:
+            width = rng.choice((1, 1, 2, 4))
+            lines.append(f"Width\t={width:02X}")
+            lines.append(f"BIOS Default =<{rng.randrange(256)}>")
+            lines.append(f"Value\t=<{rng.randrange(256 ** min(width, 2))}>")
+        else:
+            # string settings keep their value in quotes
+            lines.append("Width\t=20")
+            lines.append(f"Value\t=\"{subsystem} {index}\"")
+        lines.append("")
+    return lines
+
+
+def generate(count: int, seed: int = 0, newline: str = '\r\n') -> str:
+    """the dump as text, with CRLF line endings like the files SCEWIN writes on Windows"""
+    return newline.join(generate_lines(count, seed)) + newline
+
+
+def write(path: str, count: int, seed: int = 0, newline: str = '\r\n'):
+    with open(path, 'w', encoding='cp1252', newline='') as f:
+        f.write(generate(count, seed, newline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('count', type=int, help="number of settings")
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--lf', action='store_true', help="use LF line endings instead of CRLF")
+    args = parser.parse_args()
+    write(args.output, args.count, args.seed, '\n' if args.lf else '\r\n')
+
+
+if __name__ == '__main__':
+    main()
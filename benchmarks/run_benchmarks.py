@@ -0,0 +1,279 @@
+"""
+times the load, filter, select and save paths of the GUI without a display, on generated dumps
+of 1k, 10k and 100k settings, and checks that saving round-trips and that reloading a changed file patches
+the settings like a fresh parse. startup is timed as the import of the GUI modules in a fresh interpreter.
+results can be written as JSON and compared against an earlier run to spot regressions between commits.
+
+usage: python benchmarks/run_benchmarks.py [--sizes 1000 10000 100000] [--repeat 3]
+                                            [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_nvram  # noqa: E402
+import mapped_dump  # noqa: E402
+import nvram_parser  # noqa: E402
+import nvram_writer  # noqa: E402
+import presets  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from settings_store import SettingsStore  # noqa: E402
+import validation  # noqa: E402
+import dump_watcher  # noqa: E402
+
+ENCODING = 'cp1252'
+QUERIES = ["c-state", "power limit", "token:1A", "opt:enabled", "usb port 3", "zzz no match"]
+# every n-th setting with options gets edited before the timed save
+EDIT_EVERY = 50
+
+
+def timed(func: Callable, repeat: int) -> Dict[str, float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {'min_s': round(min(runs), 6), 'median_s': round(statistics.median(runs), 6)}
+
+
+def load(path: str) -> tuple:
+    """what the loader thread and _poll_loader do for an eager load, minus the Treeview"""
+    text = nvram_parser.read_text(path, ENCODING)
+    store = SettingsStore(nvram_parser.parse_text(text))
+    index = SearchIndex()
+    index.add_all(store)
+    return text, store, index
+
+
+def edit(store: SettingsStore) -> int:
+    edited = 0
+    for setting in store:
+        if setting.options and setting.sid % EDIT_EVERY == 0:
+            setting.active_option = (setting.active_option or 0) + 1
+            setting.active_option %= len(setting.options)
+            setting.dirty = True
+            edited += 1
+    return edited
+
+
+def check_round_trip(path: str, text: str, store: SettingsStore, out_path: str) -> Dict[str, bool]:
+    with open(path, 'rb') as f:
+        original = f.read()
+    for setting in store:
+        setting.dirty = False
+    nvram_writer.write(out_path, text, store, ENCODING)
+    with open(out_path, 'rb') as f:
+        untouched = f.read() == original
+
+    edit(store)
+    nvram_writer.write(out_path, text, store, ENCODING)
+    reparsed = list(nvram_parser.parse(out_path, ENCODING))
+    edits_kept = len(reparsed) == len(store) and all(
+        (before.active_option, before.value, before.options) == (after.active_option, after.value, after.options)
+        for before, after in zip(store, reparsed))
+    return {'untouched_identical': untouched, 'edits_reparse_equal': edits_kept}
+
+
+# fields a patched setting must share with the same setting of a fresh parse
+PATCH_FIELDS = ('setup_question', 'help_string', 'token', 'offset', 'width', 'bios_default',
+                'option_ids', 'active_option', 'value', 'content')
+PATCH_EDITS = 400
+
+
+def _matches_reparse(store: SettingsStore, text: str) -> bool:
+    fresh = list(nvram_parser.parse_text(text))
+    return len(fresh) == len(store) and all(
+        tuple(patched.spans) == tuple(parsed.spans)
+        and all(getattr(patched, name) == getattr(parsed, name) for name in PATCH_FIELDS)
+        for patched, parsed in zip(store, fresh))
+
+
+def check_patch(seed: int = 0) -> Dict[str, bool]:
+    """
+    reloading a changed file patches the settings in place, the result has to equal parsing the new text.
+    covers a line appended to the end of a record, right before the next Setup Question, and random line edits
+    """
+    text = generate_nvram.generate(200, seed)
+    lines = text.splitlines(keepends=True)
+    store = SettingsStore(nvram_parser.parse_text(text))
+    target = next(setting for setting in store if len(setting.option_ids) == 2)
+    cut = store[target.sid + 1].spans[0]
+    appended = text[:cut] + "         [02]Auto\r\n" + text[cut:]
+    patch = dump_watcher.patch_settings(store, text, appended)
+    boundary = patch is not None and patch.changed == [target.sid] and _matches_reparse(store, appended)
+
+    rng = random.Random(seed)
+    random_ok = True
+    for _ in range(PATCH_EDITS):
+        edited = list(lines)
+        line = rng.randrange(6, len(edited))
+        kind = rng.random()
+        if kind < 0.4:
+            edited.insert(line, "         [02]Auto\r\n")
+        elif kind < 0.7:
+            edited[line] = edited[line].replace('*', '') if '*' in edited[line] else edited[line].replace('=<', '=<1')
+        else:
+            del edited[line]
+        new_text = ''.join(edited)
+        store = SettingsStore(nvram_parser.parse_text(text))
+        # None means the file is loaded again, which is always right
+        if dump_watcher.patch_settings(store, text, new_text) is not None and not _matches_reparse(store, new_text):
+            random_ok = False
+            break
+    return {'patch_boundary_append': boundary, 'patch_random_edits': random_ok}
+
+
+def bench_size(count: int, directory: str, repeat: int) -> dict:
+    path = os.path.join(directory, f"nvram_{count}.txt")
+    if not os.path.exists(path):
+        generate_nvram.write(path, count)
+    out_path = os.path.join(directory, f"saved_{count}.txt")
+    text, store, index = load(path)
+    timings = {}
+
+    timings['load'] = timed(lambda: load(path), repeat)
+    timings['parse_only'] = timed(lambda: list(nvram_parser.parse_text(text)), repeat)
+
+    def scan():
+        source = mapped_dump.MappedText(path, ENCODING)
+        try:
+            for _ in mapped_dump.scan(source):
+                pass
+        finally:
+            source.close()
+    timings['lazy_scan'] = timed(scan, repeat)
+
+    def filter_all():
+        for query in QUERIES:
+            index.search(query)
+            # typing a query one key at a time refilters on every prefix
+            for end in range(1, len(query)):
+                index.search(query[:end])
+    timings['filter'] = timed(filter_all, repeat)
+
+    def select():
+        # what selecting a row costs for a lazily loaded dump
+        source = mapped_dump.MappedText(path, ENCODING)
+        try:
+            lazy = list(mapped_dump.scan(source))
+            start = time.perf_counter()
+            for setting in lazy[::max(len(lazy) // 1000, 1)]:
+                mapped_dump.materialize(setting, source)
+            return time.perf_counter() - start
+        finally:
+            source.close()
+    select_runs = [select() for _ in range(repeat)]
+    timings['select_1000'] = {'min_s': round(min(select_runs), 6),
+                              'median_s': round(statistics.median(select_runs), 6)}
+
+    timings['validate'] = timed(lambda: validation.validate(store), repeat)
+
+    edited = edit(store)
+    timings['save'] = timed(lambda: nvram_writer.write(out_path, text, store, ENCODING), repeat)
+
+    # the bulk edit path: one option set on every setting sharing a question
+    question = Counter(setting.setup_question for setting in store).most_common(1)[0][0]
+    timings['bulk_set'] = timed(lambda: presets.set_option(presets.select_settings(store, question=question),
+                                                             "Enabled"), repeat)
+
+    _, fresh, _ = load(path)
+    round_trip = check_round_trip(path, text, fresh, out_path)
+    return {
+        'settings': len(store),
+        'bytes': os.path.getsize(path),
+        'lines': text.count('\n'),
+        'edited': edited,
+        'timings': timings,
+        'round_trip': round_trip,
+    }
+
+
+def bench_startup(repeat: int) -> Dict[str, float]:
+    # everything up to creating the window, which needs a display
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-c', 'import cli, bios_settings_manager']
+    return timed(lambda: subprocess.run(command, cwd=root, check=True), repeat)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_results(results: dict, baseline: dict = None):
+    baseline_sizes = {str(run['settings']): run for run in (baseline or {}).get('runs', [])}
+    line = f"startup imports {results['startup']['min_s'] * 1000:.1f} ms"
+    if baseline and 'startup' in baseline:
+        ratio = results['startup']['min_s'] / max(baseline['startup']['min_s'], 1e-9)
+        line += f"  ({ratio:.2f}x of {baseline.get('commit') or 'baseline'})"
+    print(line)
+    for run in results['runs']:
+        print(f"{run['settings']} settings, {run['bytes'] / 1e6:.1f} MB")
+        before = baseline_sizes.get(str(run['settings']))
+        for name, timing in run['timings'].items():
+            line = f"  {name:<12}{timing['min_s'] * 1000:>10.1f} ms"
+            if before and name in before['timings']:
+                ratio = timing['min_s'] / max(before['timings'][name]['min_s'], 1e-9)
+                line += f"  ({ratio:.2f}x of {baseline.get('commit') or 'baseline'})"
+            print(line)
+        for name, ok in run['round_trip'].items():
+            print(f"  {name:<24}{'ok' if ok else 'FAILED'}")
+    for name, ok in results['checks'].items():
+        print(f"{name:<26}{'ok' if ok else 'FAILED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', help="keep the generated dumps here instead of a temporary directory")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or tmp
+        os.makedirs(directory, exist_ok=True)
+        runs: List[dict] = [bench_size(count, directory, args.repeat) for count in args.sizes]
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'startup': bench_startup(args.repeat),
+        'runs': runs,
+        'checks': check_patch(),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baseline)
+    if not all(all(run['round_trip'].values()) for run in runs) or not all(results['checks'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,70 +1,75 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, colorchooser
-import re
-from typing import List, Optional
-import winreg
+from tkinter import ttk, filedialog, messagebox
+from typing import TYPE_CHECKING, List, Optional
 import json
+import os
+import queue
+import time
 from models import BIOSSetting
+import nvram_parser
+import nvram_writer
+import mapped_dump
+from mapped_dump import MappedText
+from file_loader import BackgroundLoader
+from search_index import parse_query
+from parse_cache import ParseCache
 from theme_manager import ThemeManager
+from preferences import Preferences
+from instrumentation import TRACER, Span, span
+from virtual_list import VirtualList
+from details_panel import DetailsPanel
+from edit_journal import ACTIVE_OPTION, VALUE
+from document import Document
+
+# diffing, bulk edits, validation and reloading changed files are imported when first used,
+# so starting the GUI doesn't pay for them
+if TYPE_CHECKING:
+    import dump_watcher
+    import nvram_diff
+    import validation
 
 class BIOSSettingsManager:
+    # how often the loader queue is polled and how long each poll may insert rows for
+    LOAD_POLL_MS = 15
+    LOAD_SLICE_S = 0.03
+    # typing pauses shorter than this only refilter once
+    FILTER_DELAY_MS = 150
+    # how often the fuzzy search worker is polled for results
+    SEARCH_POLL_MS = 15
+    # files at least this big are memory-mapped and their settings decoded on first use
+    LAZY_LOAD_BYTES = 8 * 1024 * 1024
+    # how often the loaded file is checked for changes made by another program
+    WATCH_POLL_MS = 1000
+
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("scewinGUI")
         self.root.geometry("1200x800")
 
-        # Initialize theme manager
-        self.theme_manager = ThemeManager()
-
-        # load the last selected theme from the registry, if available
-        self._load_theme_from_registry()
+        # preferences are read once here and written shortly after they change
+        self.preferences = Preferences()
+        self.preferences.attach(self.root)
+        self.theme_manager = ThemeManager(self.preferences)
+        # the theme whose styles are currently configured
+        self._applied_theme: Optional[str] = None
 
         # configure initial styles
         self.style = ttk.Style()
         self.style.theme_use('default')
 
-        # storing the data
-        self.settings: List[BIOSSetting] = []
-        self.original_lines: List[str] = []
-        self.current_file: Optional[str] = None
-
-        # lovely regex
-        self.re_comment = re.compile(r'(\s*)(//.*)?$')
-        self.re_setup_question = re.compile(r'^Setup\s+Question\s*=\s*(.*)', re.IGNORECASE)
-        self.re_help_string = re.compile(r'^Help\s+String\s*=\s*(.*)', re.IGNORECASE)
-        self.re_token = re.compile(r'^Token\s*=\s*(.*)', re.IGNORECASE)
-        self.re_offset = re.compile(r'^Offset\s*=\s*(.*)', re.IGNORECASE)
-        self.re_width = re.compile(r'^Width\s*=\s*(.*)', re.IGNORECASE)
-        self.re_bios_default = re.compile(r'^BIOS\s+Default\s*=\s*(.*)', re.IGNORECASE)
-        self.re_options = re.compile(r'^Options\s*=\s*(.*)', re.IGNORECASE)
-        self.re_value = re.compile(r'^Value\s*=\s*(.*)', re.IGNORECASE)
+        # the open dumps, one per tab, and the one shown
+        self.documents: List[Document] = []
+        self.doc = Document()
+        self.parse_cache = ParseCache()
+        self._filter_job: Optional[str] = None
+        self._select_job: Optional[str] = None
+        # set while a tab's search text is put back, so that doesn't filter again
+        self._restoring_search = False
 
         self._setup_gui()
+        self._add_document(self.doc)
         self._apply_theme()
-
-    def _load_theme_from_registry(self):
-        """
-        reads the 'current_theme' from the windows registry and loads it
-        """
-        try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\MyBIOSManager", 0, winreg.KEY_READ) as key:
-                theme_name, _ = winreg.QueryValueEx(key, "current_theme")
-                if theme_name in self.theme_manager.themes:
-                    self.theme_manager.current_theme = theme_name
-        except FileNotFoundError:
-            pass
-        except Exception as e:
-            print(f"Error loading theme from registry: {e}")
-
-    def _save_theme_to_registry(self, theme_name: str):
-        """
-        saves the current theme to windows registry
-        """
-        try:
-            with winreg.CreateKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\MyBIOSManager") as key:
-                winreg.SetValueEx(key, "current_theme", 0, winreg.REG_SZ, theme_name)
-        except Exception as e:
-            print(f"Error saving theme to registry: {e}")
+        self.root.after(self.WATCH_POLL_MS, self._poll_watcher)
 
     def _setup_gui(self):
         """Setup the GUI components for the ScewinGUI manager"""
@@ -74,11 +79,28 @@ class BIOSSettingsManager:
         # FILE MENU
         self.file_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="File", menu=self.file_menu)
+        self.file_menu.add_command(label="New Tab", command=self._new_tab, accelerator="Ctrl+T")
         self.file_menu.add_command(label="Open...", command=self._load_file)
         self.file_menu.add_command(label="Save...", command=self._save_file)
+        self.file_menu.add_command(label="Compare with...", command=self._compare_file)
+        self.file_menu.add_command(label="Close Tab", command=self._close_tab, accelerator="Ctrl+W")
         self.file_menu.add_separator()
         self.file_menu.add_command(label="Exit", command=self.root.quit)
 
+        # EDIT MENU
+        self.edit_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Edit", menu=self.edit_menu)
+        self.edit_menu.add_command(label="Undo", command=self._undo, accelerator="Ctrl+Z")
+        self.edit_menu.add_command(label="Redo", command=self._redo, accelerator="Ctrl+Y")
+        self.edit_menu.add_separator()
+        self.edit_menu.add_command(label="Set Matching Settings...", command=self._show_bulk_edit)
+        self.edit_menu.add_command(label="Check Settings", command=self._check_current)
+        self.root.bind('<Control-z>', lambda event: self._undo())
+        self.root.bind('<Control-y>', lambda event: self._redo())
+        self.root.bind('<Control-Z>', lambda event: self._redo())
+        self.root.bind('<Control-t>', lambda event: self._new_tab())
+        self.root.bind('<Control-w>', lambda event: self._close_tab())
+
         # VIEW MENU
         self.view_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="View", menu=self.view_menu)
@@ -94,6 +116,9 @@ class BIOSSettingsManager:
                 value=theme_name,
                 command=self._apply_theme
             )
+        self.watch_var = tk.BooleanVar(value=self.preferences.get('watch', True))
+        self.view_menu.add_checkbutton(label="Reload When File Changes", variable=self.watch_var,
+                                       command=lambda: self.preferences.set('watch', self.watch_var.get()))
 
         # SETTINGS MENU
         self.settings_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -105,6 +130,15 @@ class BIOSSettingsManager:
         self.top_frame.pack(fill=tk.X, padx=5, pady=5)
         ttk.Button(self.top_frame, text="Load File", command=self._load_file).pack(side=tk.LEFT, padx=5)
         ttk.Button(self.top_frame, text="Save File", command=self._save_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.top_frame, text="Bulk Edit", command=self._show_bulk_edit).pack(side=tk.LEFT, padx=5)
+
+        # LOADING PROGRESS, only shown while a file is loading
+        self.progress_frame = ttk.Frame(self.top_frame)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='determinate', length=200)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        self.progress_label = ttk.Label(self.progress_frame, text="")
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.progress_frame, text="Cancel", command=self._cancel_load).pack(side=tk.LEFT, padx=5)
 
         # SERACH FRAME
         search_frame = ttk.Frame(self.top_frame)
@@ -114,6 +148,15 @@ class BIOSSettingsManager:
         self.search_var.trace('w', self._filter_settings)
         ttk.Entry(search_frame, textvariable=self.search_var, width=30).pack(side=tk.LEFT, padx=5)
 
+        # TABS, one per open dump. the tabs only show the titles, all of them share the panes below
+        self.tabs = ttk.Notebook(self.root)
+        self.tabs.pack(fill=tk.X, padx=5)
+        self.tabs.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+
+        # STATUS BAR, timing of the last operation
+        self.status_label = ttk.Label(self.root, text="", anchor=tk.W)
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+
         # MAIN FRAME
         self.main_frame = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
         self.main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -121,25 +164,18 @@ class BIOSSettingsManager:
         # LEFT FRAME: LIST OF SETTINGS
         list_frame = ttk.Frame(self.main_frame)
         self.main_frame.add(list_frame, weight=1)
-        self.settings_list = ttk.Treeview(list_frame, columns=('value',), show='tree')
-        self.settings_list.heading('#0', text='Setting')
-        self.settings_list.heading('value', text='Current Value')
-        self.settings_list.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.settings_list.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        self.settings_list.configure(yscrollcommand=scrollbar.set)
+        self.settings_list = VirtualList(list_frame, self._render_row, columns=('value',),
+                                         on_select=self._on_setting_select)
+        self.settings_list.pack(fill=tk.BOTH, expand=True)
 
         # RIGHT PANEL: DETAILS OF SELECTED SETTING
-        details_frame = ttk.Frame(self.main_frame)
-        self.main_frame.add(details_frame, weight=2)
-        self.details_text = tk.Text(details_frame, wrap=tk.WORD, height=10, state=tk.DISABLED)
-        self.details_text.pack(fill=tk.X, padx=5, pady=5)
-        self.options_frame = ttk.LabelFrame(details_frame, text="Options")
-        self.options_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.details_panel = DetailsPanel(self.main_frame, on_option=self._update_option, on_value=self._update_value)
+        self.main_frame.add(self.details_panel, weight=2)
+        self.details_text = self.details_panel.details_text
 
-        self.settings_list.bind('<<TreeviewSelect>>', self._on_setting_select)
 
     def _show_theme_editor(self):
+        from tkinter import colorchooser
         theme_editor = tk.Toplevel(self.root)
         theme_editor.title("Theme Editor")
         theme_editor.geometry("400x500")
@@ -172,6 +208,10 @@ class BIOSSettingsManager:
             new_theme = {key: var.get() for key, var in color_vars.items()}
             self.theme_manager.themes[name] = new_theme
             self.theme_manager.save_custom_themes()
+            if name == self._applied_theme:
+                # the theme was overwritten, apply its new colors
+                self._applied_theme = None
+                self._apply_theme()
             self.theme_menu.add_radiobutton(
                 label=name,
                 variable=self.theme_var,
@@ -197,44 +237,30 @@ class BIOSSettingsManager:
 
     def _apply_theme(self):
         theme_name = self.theme_var.get()
-        theme = self.theme_manager.themes[theme_name]
-        self.theme_manager.current_theme = theme_name
-        # tryint to save the theme to the registry
-        self._save_theme_to_registry(theme_name)
+        if theme_name == self._applied_theme:
+            return
+        theme = self.theme_manager.colors(theme_name)
+        self.theme_manager.select(theme_name)
+        self._applied_theme = theme_name
         self.root.configure(bg=theme['bg'])
         style = self.style
-        style.configure('.',
-                        background=theme['bg'],
-                        foreground=theme['fg'],
-                        fieldbackground=theme['inputbg'],
-                        troughcolor=theme['bg'],
-                        selectbackground=theme['selectbg'],
-                        selectforeground=theme['selectfg'])
-        style.configure('TFrame', background=theme['framebg'])
-        style.configure('TLabelframe', background=theme['framebg'])
-        style.configure('TLabelframe.Label', background=theme['framebg'], foreground=theme['fg'])
-        style.configure('TButton', background=theme['buttonbg'], foreground=theme['buttonfg'], bordercolor=theme['buttonbg'])
-        style.configure('TEntry', fieldbackground=theme['inputbg'], foreground=theme['inputfg'])
-        style.configure('Treeview', background=theme['bg'], foreground=theme['fg'], fieldbackground=theme['bg'])
-        style.configure('Treeview.Heading', background=theme['buttonbg'], foreground=theme['buttonfg'])
-        style.map('Treeview',
-                  background=[('selected', theme['selectbg'])],
-                  foreground=[('selected', theme['selectfg'])])
-        style.configure('TLabel', background=theme['framebg'], foreground=theme['fg'])
-        style.configure('TRadiobutton', background=theme['framebg'], foreground=theme['fg'])
-        style.configure('TCombobox', fieldbackground=theme['inputbg'], foreground=theme['inputfg'], background=theme['buttonbg'])
-        self.details_text.configure(bg=theme['textbg'],
-                                    fg=theme['textfg'],
-                                    insertbackground=theme['fg'],
-                                    selectbackground=theme['selectbg'],
-                                    selectforeground=theme['selectfg'])
+        for style_name, options, mapping in self.theme_manager.style_settings(theme_name):
+            style.configure(style_name, **options)
+            if mapping:
+                style.map(style_name, **mapping)
+        for text_widget in (self.details_text, self.details_panel.listbox):
+            text_widget.configure(bg=theme['textbg'],
+                                  fg=theme['textfg'],
+                                  selectbackground=theme['selectbg'],
+                                  selectforeground=theme['selectfg'])
+        self.details_text.configure(insertbackground=theme['fg'])
         for widget in self.root.winfo_children():
             if isinstance(widget, ttk.Frame) or isinstance(widget, ttk.LabelFrame):
                 widget.configure(style='TFrame')
         menu_bg = theme['buttonbg']
         menu_fg = theme['buttonfg']
         self.menu_bar.configure(bg=menu_bg, fg=menu_fg)
-        for menu in [self.file_menu, self.view_menu, self.settings_menu, self.theme_menu]:
+        for menu in [self.file_menu, self.edit_menu, self.view_menu, self.settings_menu, self.theme_menu]:
             menu.configure(bg=menu_bg, fg=menu_fg,
                            activebackground=theme['selectbg'],
                            activeforeground=theme['selectfg'])
@@ -245,274 +271,765 @@ class BIOSSettingsManager:
         )
         if not filename:
             return
-        self.current_file = filename
-        self.settings.clear()
-        self.settings_list.delete(*self.settings_list.get_children())
-        try:
-            with open(filename, 'r', encoding='ansi') as f:
-                self.original_lines = f.readlines()
-            current_setting = None
-            def finalize_setting(s: BIOSSetting):
-                if s is not None:
-                    if s.options is None:
-                        s.options = []
-                    if len(s.options) == 1 and s.active_option is None:
-                        s.value = s.options[0]
-                        s.options = []
-                    self.settings.append(s)
-            re_bracket_option = re.compile(r'^\**\[(.*?)\](.*)')
-            for raw_line in self.original_lines:
-                line = self.re_comment.sub('', raw_line).strip()
-                if not line:
-                    continue
-                match_setup = self.re_setup_question.match(line)
-                if match_setup:
-                    finalize_setting(current_setting)
-                    current_setting = BIOSSetting(
-                        setup_question=match_setup.group(1).strip(),
-                        options=[],
-                        content=[]
-                    )
-                    continue
-                if not current_setting:
-                    continue
-                match_help = self.re_help_string.match(line)
-                if match_help:
-                    current_setting.help_string = match_help.group(1).strip()
-                    continue
-                match_token = self.re_token.match(line)
-                if match_token:
-                    current_setting.token = match_token.group(1).strip()
-                    continue
-                match_off = self.re_offset.match(line)
-                if match_off:
-                    current_setting.offset = match_off.group(1).strip()
-                    continue
-                match_wid = self.re_width.match(line)
-                if match_wid:
-                    current_setting.width = match_wid.group(1).strip()
-                    continue
-                match_def = self.re_bios_default.match(line)
-                if match_def:
-                    current_setting.bios_default = match_def.group(1).strip()
-                    continue
-                match_opt = self.re_options.match(line)
-                if match_opt:
-                    remainder = match_opt.group(1).strip()
-                    self._parse_options_line(remainder, current_setting, re_bracket_option)
-                    continue
-                match_val = self.re_value.match(line)
-                if match_val:
-                    val = match_val.group(1).strip()
-                    current_setting.value = val
-                    continue
-                bracket_line = re_bracket_option.match(line)
-                if bracket_line:
-                    self._parse_options_line(line, current_setting, re_bracket_option)
-                    continue
-                current_setting.content.append(line)
-            finalize_setting(current_setting)
-            self._populate_settings_list()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load file: {str(e)}")
+        self._open_file(filename)
 
-    def _parse_options_line(self, line: str, setting: BIOSSetting, bracket_regex: re.Pattern):
-        pattern = re.compile(r'(\*?)\[([^\]]+)\](\S.*?|)$')
-        found = pattern.findall(line)
-        if not found:
-            star_in_front = line.strip().startswith('*')
-            clean_line = line.lstrip('*').strip()
-            if clean_line:
-                index = len(setting.options)
-                setting.options.append(clean_line)
-                if star_in_front:
-                    setting.active_option = index
-            return
-        for match in found:
-            star, bracket_num, remainder = match
-            option_str = f"[{bracket_num}]{remainder}".strip()
-            index = len(setting.options)
-            setting.options.append(option_str)
-            if star == '*':
-                setting.active_option = index
-
-    def _populate_settings_list(self, filter_text: str = ''):
-        self.settings_list.delete(*self.settings_list.get_children())
-        for setting in self.settings:
-            if filter_text.lower() in setting.setup_question.lower():
-                display_value = ""
-                if setting.options:
-                    if setting.active_option is not None and 0 <= setting.active_option < len(setting.options):
-                        display_value = setting.options[setting.active_option]
+    def _open_file(self, filename: str, doc: Optional[Document] = None):
+        """
+        loads `filename` into `doc`, by default the current tab if it is empty, otherwise a new tab
+        """
+        if doc is None:
+            doc = self.doc if self.doc.empty else self._add_document(Document())
+            self._show_document(doc)
+        if doc.loader is not None:
+            doc.loader.cancel()
+        doc.current_file = filename
+        doc.after_load = None
+        self._clear_settings(doc)
+        self.tabs.tab(self._tab_of(doc), text=doc.title)
+        # taken before reading, so a change made while loading is still noticed
+        from dump_watcher import FileWatcher
+        doc.watcher = FileWatcher(filename)
+        lazy = os.path.getsize(filename) >= self.LAZY_LOAD_BYTES
+        doc.loader = BackgroundLoader(filename, nvram_parser.DEFAULT_ENCODING, lazy=lazy, cache=self.parse_cache)
+        doc.load_span = span('load')
+        if doc is self.doc:
+            self._show_progress(doc)
+        doc.loader.start()
+        self.root.after(self.LOAD_POLL_MS, self._poll_loader, doc, doc.loader)
+
+    def _show_progress(self, doc: Document):
+        if doc.loader is None:
+            self.progress_frame.pack_forget()
+            return
+        self.progress_bar.configure(value=doc.loader.progress, maximum=1)
+        self.progress_label.configure(text=f"{len(doc.store)} settings" if len(doc.store) else "Loading...")
+        self.progress_frame.pack(side=tk.LEFT, padx=5)
+
+    def _poll_loader(self, doc: Document, loader: BackgroundLoader):
+        """
+        drains parsed batches from the loader thread into the store and the list,
+        giving the event loop back after a short time slice so the window stays responsive.
+        a tab loading in the background fills its store, the list follows once it is shown
+        """
+        if loader is not doc.loader:
+            return
+        active = doc is self.doc
+        deadline = time.perf_counter() + self.LOAD_SLICE_S
+        terms = parse_query(self.search_var.get() if active else doc.search_text)
+        # while filtering, new settings that match are appended to the view, otherwise it is just a longer range
+        view = None
+        if terms:
+            view = doc.view if isinstance(doc.view, list) else list(doc.view)
+        while time.perf_counter() < deadline:
+            try:
+                message = loader.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'text':
+                doc.original_text = message[1]
+            elif kind == 'batch':
+                _, batch, done, total = message
+                for setting in batch:
+                    sid = doc.store.add(setting)
+                    doc.search_index.add(setting)
+                    if view is not None and doc.search_index.matches(sid, terms):
+                        view.append(sid)
+                if active:
+                    self.progress_bar.configure(value=done, maximum=max(total, 1))
+                    self.progress_label.configure(text=f"{len(doc.store)} settings")
+            elif kind == 'done':
+                self._show_loaded(doc, view)
+                load_span = doc.load_span.finish(rows=len(doc.store))
+                self._finish_load(doc)
+                phases = [TRACER.last.get(name) for name in ('read', 'parse', 'scan')]
+                phases = ", ".join(f"{phase.name} {phase.duration * 1000:.0f} ms" for phase in phases
+                                   if phase is not None and phase.start >= load_span.start)
+                if active:
+                    self._show_status(f"Loaded {len(doc.store)} settings in {load_span.duration * 1000:.0f} ms"
+                                      + (f" ({phases})" if phases else ""))
+                doc.fuzzy_search.reset(list(doc.store))
+                if doc.after_load is not None:
+                    after_load, doc.after_load = doc.after_load, None
+                    after_load()
+                if terms:
+                    # rows were matched exactly while loading, rank them now
+                    if doc is self.doc:
+                        self._apply_filter()
                     else:
-                        display_value = ", ".join(setting.options)
-                elif setting.value is not None:
-                    display_value = setting.value
-                self.settings_list.insert('', 'end', 
-                                          iid=setting.unique_id,
-                                          text=setting.setup_question, 
-                                          values=(display_value,))
+                        doc.filter_pending = True
+                return
+            elif kind == 'cancelled':
+                return
+            elif kind == 'error':
+                print(f"Error loading {loader.filename}: {message[1]}")
+                self._clear_loaded_file(doc)
+                self._finish_load(doc)
+                messagebox.showerror("Error", f"Failed to load file: {str(message[1])}")
+                return
+        self._show_loaded(doc, view)
+        self.root.after(self.LOAD_POLL_MS, self._poll_loader, doc, loader)
+
+    def _show_loaded(self, doc: Document, view: Optional[List[int]]):
+        # the list only redraws its visible rows, so this is cheap however many settings came in
+        doc.view = view if view is not None else range(len(doc.store))
+        doc.ranked = False
+        if doc is self.doc:
+            self.settings_list.set_keys(doc.view)
+
+    def _cancel_load(self):
+        doc = self.doc
+        if doc.loader is None:
+            return
+        doc.loader.cancel()
+        self._clear_loaded_file(doc)
+        self._finish_load(doc)
+
+    def _finish_load(self, doc: Document):
+        doc.loader = None
+        doc.load_span = None
+        if doc is self.doc:
+            self.progress_frame.pack_forget()
+
+    def _show_status(self, text: str):
+        self.status_label.configure(text=text)
+
+    def _clear_loaded_file(self, doc: Document):
+        # a partially loaded dump must never be saved back
+        doc.current_file = None
+        doc.watcher = None
+        doc.after_load = None
+        self._clear_settings(doc)
+        self.tabs.tab(self._tab_of(doc), text=doc.title)
+
+    def _clear_settings(self, doc: Document):
+        doc.view = range(0)
+        doc.ranked = False
+        doc.selected = None
+        doc.top = 0
+        doc.problems = []
+        doc.saved_values = {}
+        if doc is self.doc:
+            self.settings_list.marked = frozenset()
+            self.settings_list.select(None)
+            self.settings_list.set_keys(doc.view)
+            self.details_panel.show(None)
+        doc.store.clear()
+        doc.journal.clear()
+        doc.search_index.clear()
+        doc.fuzzy_search.reset(())
+        # a mapping still being scanned is closed by its loader
+        if isinstance(doc.original_text, MappedText) and doc.loader is None:
+            doc.original_text.close()
+        doc.original_text = ""
+
+    # TABS
+
+    def _add_document(self, doc: Document) -> Document:
+        """adds a tab for `doc`, the tabs only hold the titles, every tab shares the list and details panel"""
+        self.documents.append(doc)
+        self.tabs.add(ttk.Frame(self.tabs, height=0), text=doc.title)
+        return doc
+
+    def _tab_of(self, doc: Document) -> str:
+        return self.tabs.tabs()[self.documents.index(doc)]
+
+    def _new_tab(self):
+        self._show_document(self._add_document(Document()))
+
+    def _on_tab_changed(self, event):
+        selected = self.tabs.select()
+        if not selected:
+            return
+        doc = self.documents[self.tabs.index(selected)]
+        if doc is not self.doc:
+            self._show_document(doc)
+
+    def _show_document(self, doc: Document):
+        """
+        swaps the shown dump, keeping the filter, selection and scroll position of the one hidden.
+        nothing is parsed or indexed again, the list just gets the other document's view
+        """
+        old = self.doc
+        if old is not doc and old in self.documents:
+            old.search_text = self.search_var.get()
+            old.selected = self.settings_list.selection()
+            old.top = self.settings_list.top
+            if self._filter_job is not None:
+                self.root.after_cancel(self._filter_job)
+                self._filter_job = None
+                old.filter_pending = True
+        self.doc = doc
+        if self.tabs.select() != self._tab_of(doc):
+            self.tabs.select(self._tab_of(doc))
+        self._restoring_search = True
+        try:
+            self.search_var.set(doc.search_text)
+        finally:
+            self._restoring_search = False
+        self.settings_list.selected = doc.selected
+        self.settings_list.top = doc.top
+        self.settings_list.marked = {problem.sid for problem in doc.problems}
+        self.settings_list.set_keys(doc.view, ascending=not doc.ranked)
+        self.details_panel.show(None)
+        if doc.selected is not None:
+            self._on_setting_select()
+        self._show_progress(doc)
+        if doc.filter_pending:
+            doc.filter_pending = False
+            self._apply_filter()
+
+    def _close_tab(self):
+        doc = self.doc
+        edited = doc.edited()
+        if edited and not messagebox.askyesno("Close Tab", f"{doc.title} has {edited} unsaved edits, close it anyway?"):
+            return
+        index = self.documents.index(doc)
+        tab = self._tab_of(doc)
+        # the tab goes first so tab and document indices still line up when the notebook switches tabs
+        self.documents.remove(doc)
+        self.tabs.forget(tab)
+        doc.close()
+        if not self.documents:
+            self._add_document(Document())
+        self._show_document(self.documents[min(index, len(self.documents) - 1)])
+
+    # WATCHING THE OPEN FILES
+
+    def _poll_watcher(self):
+        self.root.after(self.WATCH_POLL_MS, self._poll_watcher)
+        if not self.watch_var.get():
+            return
+        for doc in list(self.documents):
+            if doc.watcher is not None and doc.loader is None and doc.watcher.poll():
+                self._reload_changed_file(doc)
+
+    def _reload_changed_file(self, doc: Document):
+        """
+        brings a loaded dump up to date with the file on disk. only the records around the changed part
+        are parsed again and patched in place, keeping the selection, filter, scroll position and edits
+        to other settings. if records were added or removed the file is loaded again and that state restored
+        """
+        import dump_watcher
+        if isinstance(doc.original_text, str):
+            with span('reparse', rows=len(doc.store)) as reparse_span:
+                try:
+                    new_text = nvram_parser.read_text(doc.current_file)
+                    patch = dump_watcher.patch_settings(doc.store, doc.original_text, new_text)
+                except Exception as e:
+                    print(f"Error reloading {doc.current_file}: {e}")
+                    self._show_status(f"Could not reload {doc.current_file}: {e}")
+                    return
+                if patch is not None:
+                    reparse_span.count(changed=len(patch.changed), chars=patch.parsed)
+            if patch is not None:
+                doc.original_text = new_text
+                self._apply_patch(doc, patch, reparse_span)
+                return
+        self._reload_keeping_state(doc)
+
+    def _apply_patch(self, doc: Document, patch: "dump_watcher.Patch", reparse_span: Span):
+        if not patch.changed:
+            self._show_status(f"{doc.title} changed on disk, no settings changed ({reparse_span.describe()})")
+            return
+        # undoing would put back values from before the file changed
+        doc.journal.clear()
+        for sid in patch.changed:
+            doc.search_index.update(doc.store[sid])
+        doc.fuzzy_search.reset(list(doc.store))
+        if doc is self.doc:
+            for sid in patch.changed:
+                self.settings_list.refresh(sid)
+            if self.settings_list.selection() in set(patch.changed):
+                self.details_panel.refresh()
+            if self.search_var.get().strip():
+                self._apply_filter()
+        elif doc.search_text.strip():
+            doc.filter_pending = True
+        self._show_status(f"Reloaded {len(patch.changed)} changed settings of {doc.title} "
+                          f"({reparse_span.describe()})")
+        if patch.conflicts:
+            self._warn_settings(f"These edited settings of {doc.title} also changed on disk, "
+                                "the edits were replaced by the new values:",
+                                [doc.store[sid].setup_question for sid in patch.conflicts])
+
+    def _warn_settings(self, message: str, questions: List[str]):
+        listed = "\n".join(questions[:10])
+        if len(questions) > 10:
+            listed += f"\n...and {len(questions) - 10} more"
+        messagebox.showwarning("File Changed", f"{message}\n{listed}")
+
+    def _reload_keeping_state(self, doc: Document):
+        import dump_watcher
+        edits = dump_watcher.collect_edits(doc.store, doc.original_text)
+        selected = self.settings_list.selection() if doc is self.doc else doc.selected
+        top = self.settings_list.top if doc is self.doc else doc.top
+        selected_key = None
+        if selected is not None:
+            setting = doc.store[selected]
+            same_key = doc.store.by_key(*setting.key)
+            selected_key = (setting.key, next(i for i, other in enumerate(same_key) if other is setting))
+
+        def restore():
+            applied, dropped = dump_watcher.restore_edits(edits, doc.store, doc.original_text,
+                                                          lambda setting: self._materialize(setting, doc))
+            sid = None
+            if selected_key is not None:
+                key, ordinal = selected_key
+                same_key = doc.store.by_key(*key)
+                if ordinal < len(same_key):
+                    sid = same_key[ordinal].sid
+            if doc is self.doc:
+                for edited in applied:
+                    self.settings_list.refresh(edited)
+                if sid is not None:
+                    self.settings_list.top = top
+                    self.settings_list.select(sid, notify=True)
+            else:
+                doc.selected, doc.top = sid, top
+            if dropped:
+                self._warn_settings(f"These edited settings of {doc.title} changed or disappeared on disk, "
+                                    "the edits were dropped:", [edit.key[0] for edit in dropped])
+
+        self._open_file(doc.current_file, doc)
+        doc.after_load = restore
+
+    def _render_row(self, sid: int) -> tuple:
+        setting = self.doc.store[sid]
+        return setting.setup_question, (self._display_value(setting),)
+
+    def _refresh_setting(self, setting: BIOSSetting):
+        """updates the row of a single edited setting in place, if it is scrolled into view"""
+        self.settings_list.refresh(setting.sid)
+
+    @staticmethod
+    def _display_value(setting: BIOSSetting) -> str:
+        if setting.preview is not None:
+            return setting.preview
+        options = setting.options
+        if options:
+            if setting.active_option is not None and 0 <= setting.active_option < len(options):
+                return options[setting.active_option]
+            return ", ".join(options)
+        if setting.value is not None:
+            return setting.value
+        return ""
 
     def _filter_settings(self, *args):
-        self._populate_settings_list(self.search_var.get())
+        if self._restoring_search:
+            return
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(self.FILTER_DELAY_MS, self._apply_filter)
 
-    def _on_setting_select(self, event):
-        selection = self.settings_list.selection()
-        if not selection:
+    def _apply_filter(self):
+        """
+        hands the matching ids to the list, which only redraws the rows in view.
+        free text is ranked by the fuzzy search worker once loading finished, field terms like
+        token:1A and queries typed while loading are matched exactly here in file order
+        """
+        self._filter_job = None
+        doc = self.doc
+        doc.filter_pending = False
+        terms = parse_query(self.search_var.get())
+        text = " ".join(phrase for field, phrase in terms if field is None)
+        if doc.loader is not None or not text:
+            doc.fuzzy_search.cancel()
+            with span('filter', rows=len(doc.store)) as filter_span:
+                matches = doc.search_index.search_terms(terms)
+                doc.view = range(len(doc.store)) if matches is None else sorted(matches)
+                doc.ranked = False
+                self.settings_list.set_keys(doc.view)
+                filter_span.count(matches=len(doc.view))
+            self._show_status(filter_span.describe())
             return
-        unique_id = selection[0]
-        setting = next((s for s in self.settings if s.unique_id == unique_id), None)
+        # plain substring hits rank first, field terms restrict what the fuzzy search may return
+        exact = doc.search_index.search_terms(terms)
+        allowed = doc.search_index.search_terms([term for term in terms if term[0] is not None])
+        doc.search_span = span('search', rows=len(doc.store))
+        generation = doc.fuzzy_search.submit(text, allowed, exact)
+        self._show_status("Searching...")
+        self.root.after(self.SEARCH_POLL_MS, self._poll_search, doc, generation)
+
+    def _poll_search(self, doc: Document, generation: int):
+        if generation != doc.fuzzy_search.generation:
+            # a newer query or a reset took over, its own poll picks up the results
+            return
+        if doc is not self.doc:
+            # the tab was switched away from, search again once it is shown
+            doc.fuzzy_search.cancel()
+            doc.filter_pending = True
+            return
+        while True:
+            try:
+                result_generation, ranked = doc.fuzzy_search.results.get_nowait()
+            except queue.Empty:
+                self.root.after(self.SEARCH_POLL_MS, self._poll_search, doc, generation)
+                return
+            if result_generation == generation:
+                break
+        doc.view = ranked
+        doc.ranked = True
+        self.settings_list.set_keys(ranked, ascending=False)
+        self._show_status(doc.search_span.finish(matches=len(ranked)).describe())
+
+    def _materialize(self, setting: BIOSSetting, doc: Optional[Document] = None) -> BIOSSetting:
+        """decodes a lazily loaded setting of `doc`, the current tab by default, in full. a no-op for loaded ones"""
+        doc = doc or self.doc
+        if setting.preview is not None:
+            mapped_dump.materialize(setting, doc.original_text)
+            doc.search_index.update(setting)
+        return setting
+
+    def _select_setting(self, setting: BIOSSetting):
+        if self.settings_list.index_of(setting.sid) is None:
+            # the row is filtered out, clear the search so it can be shown
+            self.search_var.set("")
+            self._apply_filter()
+        self.settings_list.select(setting.sid, notify=True)
+
+    def _on_setting_select(self, sid: Optional[int] = None):
+        # holding an arrow key selects rows faster than the panel redraws, only the last one is shown
+        if self._select_job is None:
+            self._select_job = self.root.after_idle(self._show_selected)
+
+    def _show_selected(self):
+        self._select_job = None
+        sid = self.settings_list.selection()
+        setting = self.doc.store.get(sid) if sid is not None else None
         if not setting:
             return
-        for widget in self.options_frame.winfo_children():
-            widget.destroy()
-        self.details_text.config(state=tk.NORMAL)
-        self.details_text.delete('1.0', tk.END)
-        details_lines = [
-            f"Setup Question: {setting.setup_question}",
-            f"Help String: {setting.help_string}",
-            f"Token: {setting.token}",
-            f"Offset: {setting.offset}",
-            f"Width: {setting.width}"
-        ]
-        if setting.bios_default is not None:
-            details_lines.append(f"BIOS Default: {setting.bios_default}")
-        if setting.value:
-            details_lines.append(f"Value: {setting.value}")
-        final_details = "\n".join(details_lines) + "\n"
-        self.details_text.insert('1.0', final_details)
-        self.details_text.config(state=tk.DISABLED)
-        if setting.options:
-            var = tk.StringVar(value="")
-            for i, option in enumerate(setting.options):
-                rb = ttk.Radiobutton(
-                    self.options_frame,
-                    text=option,
-                    value=option,
-                    variable=var,
-                    command=lambda s=setting, idx=i: self._update_option(s, idx)
-                )
-                rb.pack(anchor=tk.W)
-            if setting.active_option is not None and 0 <= setting.active_option < len(setting.options):
-                var.set(setting.options[setting.active_option])
-        elif setting.value is not None:
-            var = tk.StringVar(value=setting.value)
-            entry = ttk.Entry(self.options_frame, textvariable=var)
-            entry.pack(fill=tk.X, padx=5, pady=5)
-            update_btn = ttk.Button(self.options_frame, text="Update Value",
-                                    command=lambda s=setting, v=var: self._update_value(s, v))
-            update_btn.pack()
+        with span('select', options=len(setting.option_ids), lazy=int(setting.preview is not None)) as select_span:
+            self._show_setting(setting)
+        if sid in self.settings_list.marked:
+            self._show_status("; ".join(problem.message for problem in self.doc.problems if problem.sid == sid))
+            return
+        self._show_status(select_span.describe())
+
+    def _show_setting(self, setting: BIOSSetting):
+        self._materialize(setting)
+        self.details_panel.show(setting)
 
     def _update_option(self, setting: BIOSSetting, new_active: int):
-        setting.active_option = new_active
-        self._populate_settings_list(self.search_var.get())
+        if setting.active_option != new_active:
+            self.doc.journal.record(setting, ACTIVE_OPTION, setting.active_option, new_active, setting.dirty)
+            setting.active_option = new_active
+            setting.dirty = True
+        self._refresh_setting(setting)
+
+    def _update_value(self, setting: BIOSSetting, value: str):
+        if setting.value != value:
+            self.doc.journal.record(setting, VALUE, setting.value, value, setting.dirty)
+            setting.value = value
+            setting.dirty = True
+        self._refresh_setting(setting)
+        self.details_panel.refresh()
+
+    def _undo(self):
+        label = self.doc.journal.undo_label()
+        if label is None:
+            self._show_status("Nothing to undo")
+            return
+        self._show_edited(self.doc.journal.undo())
+        self._show_status(f"Undid {label}")
 
-    def _update_value(self, setting: BIOSSetting, value_var: tk.StringVar):
-        setting.value = value_var.get()
-        self._populate_settings_list(self.search_var.get())
+    def _redo(self):
+        label = self.doc.journal.redo_label()
+        if label is None:
+            self._show_status("Nothing to redo")
+            return
+        self._show_edited(self.doc.journal.redo())
+        self._show_status(f"Redid {label}")
+
+    def _show_edited(self, sids: List[int]):
+        """redraws just the rows (and the details, if selected) of settings changed by undo or redo"""
+        for sid in sids:
+            self.settings_list.refresh(sid)
+        if self.settings_list.selection() in set(sids):
+            self.details_panel.refresh()
+
+    def _show_bulk_edit(self):
+        """
+        sets one option on every setting matching a question, regex or token, in one pass
+        """
+        doc = self.doc
+        if doc.loader is not None:
+            messagebox.showwarning("Warning", "Please wait until the file has finished loading")
+            return
+        if not len(doc.store):
+            messagebox.showwarning("Warning", "No file loaded")
+            return
+        import presets
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Set Matching Settings")
+        dialog.geometry("500x260")
+
+        match_frame = ttk.LabelFrame(dialog, text="Match Settings")
+        match_frame.pack(fill=tk.X, padx=5, pady=5)
+        mode_var = tk.StringVar(value='question')
+        modes_frame = ttk.Frame(match_frame)
+        modes_frame.pack(fill=tk.X, padx=5)
+        for text, mode in (("Question", 'question'), ("Regex", 'pattern'), ("Token", 'token')):
+            ttk.Radiobutton(modes_frame, text=text, value=mode, variable=mode_var).pack(side=tk.LEFT, padx=5)
+        query_var = tk.StringVar()
+        selected = self.settings_list.selection()
+        if selected is not None:
+            query_var.set(doc.store[selected].setup_question.strip())
+        query_frame = ttk.Frame(match_frame)
+        query_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Entry(query_frame, textvariable=query_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(query_frame, text="Find", command=lambda: find()).pack(side=tk.LEFT, padx=5)
+        found_label = ttk.Label(match_frame, text="")
+        found_label.pack(anchor=tk.W, padx=5, pady=5)
+
+        option_frame = ttk.LabelFrame(dialog, text="Set Option")
+        option_frame.pack(fill=tk.X, padx=5, pady=5)
+        option_var = tk.StringVar()
+        option_combo = ttk.Combobox(option_frame, textvariable=option_var)
+        option_combo.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        ttk.Button(option_frame, text="Apply", command=lambda: apply()).pack(side=tk.LEFT, padx=5)
+        matches: List[BIOSSetting] = []
+
+        def find():
+            query = query_var.get().strip()
+            matches.clear()
+            if not query:
+                found_label.configure(text="")
+                return
+            try:
+                matches.extend(presets.select_settings(doc.store, **{mode_var.get(): query}))
+            except Exception as e:
+                messagebox.showerror("Error", f"Invalid search: {str(e)}", parent=dialog)
+                return
+            # the labels every matching setting offers, collected once per distinct option list
+            labels = []
+            seen_lists = set()
+            for setting in matches:
+                self._materialize(setting, doc)
+                if setting.option_ids not in seen_lists:
+                    seen_lists.add(setting.option_ids)
+                    labels.extend(label for label in setting.options if label not in labels)
+            option_combo['values'] = labels
+            found_label.configure(text=f"{len(matches)} matching settings")
+
+        def apply():
+            if not matches:
+                find()
+            label = option_var.get().strip()
+            if not matches or not label:
+                return
+            before = [(setting, setting.active_option, setting.dirty) for setting in matches]
+            result = presets.set_option(matches, label)
+            with doc.journal.group(f"Set {len(matches)} settings to {label}"):
+                for setting, old, was_dirty in before:
+                    if setting.active_option != old:
+                        doc.journal.record(setting, ACTIVE_OPTION, old, setting.active_option, was_dirty)
+            # update the rows in place once for the whole batch
+            if doc is self.doc:
+                for setting in matches:
+                    self._refresh_setting(setting)
+                if self.settings_list.selection() in {setting.sid for setting in matches}:
+                    self._on_setting_select()
+            message = f"Changed {result.changed} settings, {result.unchanged} were already set"
+            if result.invalid:
+                message += f", {len(result.invalid)} have no option {label!r}"
+            messagebox.showinfo("Bulk Edit", message, parent=dialog)
+
+    def _compare_file(self):
+        if self.doc.loader is not None:
+            messagebox.showwarning("Warning", "Please wait until the file has finished loading")
+            return
+        if not self.doc.current_file:
+            messagebox.showwarning("Warning", "No file loaded")
+            return
+        filename = filedialog.askopenfilename(
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            other = list(nvram_parser.parse(filename, nvram_parser.DEFAULT_ENCODING))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load file: {str(e)}")
+            return
+        import nvram_diff
+        # the loaded side includes unsaved edits
+        doc = self.doc
+        entries = nvram_diff.diff_settings(doc.store, other, resolve=lambda setting: self._materialize(setting, doc))
+        self._show_diff(doc, entries, doc.title, os.path.basename(filename))
+
+    def _show_diff(self, doc: Document, entries: "List[nvram_diff.DiffEntry]", left_name: str, right_name: str):
+        """side by side view of a diff, double clicking a row selects the setting in the main list"""
+        import nvram_diff
+        window = tk.Toplevel(self.root)
+        window.title(f"Compare {left_name} with {right_name}")
+        window.geometry("1000x600")
+        counts = {kind: 0 for kind in (nvram_diff.CHANGED, nvram_diff.ADDED, nvram_diff.REMOVED)}
+        for entry in entries:
+            counts[entry.kind] += 1
+        summary = (f"{counts[nvram_diff.CHANGED]} changed, {counts[nvram_diff.REMOVED]} only in {left_name}, "
+                   f"{counts[nvram_diff.ADDED]} only in {right_name}")
+        ttk.Label(window, text=summary).pack(fill=tk.X, padx=5, pady=5)
+
+        frame = ttk.Frame(window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        tree = ttk.Treeview(frame, columns=('status', 'token', 'offset', 'left', 'right'))
+        tree.heading('#0', text='Setting')
+        tree.heading('status', text='Status')
+        tree.heading('token', text='Token')
+        tree.heading('offset', text='Offset')
+        tree.heading('left', text=left_name)
+        tree.heading('right', text=right_name)
+        tree.column('#0', width=300)
+        for column, width in (('status', 110), ('token', 60), ('offset', 60), ('left', 200), ('right', 200)):
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        statuses = {
+            nvram_diff.CHANGED: "changed",
+            nvram_diff.REMOVED: f"only in {left_name}",
+            nvram_diff.ADDED: f"only in {right_name}",
+        }
+        # the loaded side of each row, by row id
+        loaded = {}
+        for i, entry in enumerate(entries):
+            question, token, offset = entry.key
+            status = statuses[entry.kind]
+            if entry.options_changed:
+                status += " (options)"
+            tree.insert('', 'end', iid=str(i), text=question,
+                        values=(status, token, offset, entry.old_value, entry.new_value))
+            if entry.old is not None:
+                loaded[str(i)] = entry.old
+
+        def select_in_main(event):
+            row = tree.focus()
+            if row in loaded and doc in self.documents:
+                self._show_document(doc)
+                self._select_setting(loaded[row])
+        tree.bind('<Double-1>', select_in_main)
+
+    def _check_settings(self, doc: Document) -> "List[validation.Problem]":
+        """checks every setting of `doc` and highlights the rows with problems"""
+        import validation
+        with span('validate', rows=len(doc.store)) as validate_span:
+            doc.problems = validation.validate(doc.store)
+            validate_span.count(problems=len(doc.problems))
+        if doc is self.doc:
+            self.settings_list.mark({problem.sid for problem in doc.problems})
+        errors = validation.count(doc.problems, validation.ERROR)
+        warnings = validation.count(doc.problems, validation.WARNING)
+        self._show_status(f"{errors} errors, {warnings} warnings ({validate_span.describe()})")
+        return doc.problems
+
+    def _check_current(self):
+        doc = self.doc
+        if doc.loader is not None:
+            messagebox.showwarning("Warning", "Please wait until the file has finished loading")
+            return
+        if not len(doc.store):
+            messagebox.showwarning("Warning", "No file loaded")
+            return
+        problems = self._check_settings(doc)
+        if not problems:
+            messagebox.showinfo("Check Settings", f"No problems found in {len(doc.store)} settings")
+            return
+        messagebox.showwarning("Check Settings", self._describe_problems(problems))
+
+    @staticmethod
+    def _describe_problems(problems: "List[validation.Problem]") -> str:
+        import validation
+        errors = validation.count(problems, validation.ERROR)
+        warnings = validation.count(problems, validation.WARNING)
+        # errors first, they are what breaks an import
+        shown = sorted(problems, key=lambda problem: problem.severity != validation.ERROR)[:10]
+        listed = "\n".join(f"{problem.key[0]}: {problem.message}" for problem in shown)
+        if len(problems) > len(shown):
+            listed += f"\n...and {len(problems) - len(shown)} more, highlighted in the list"
+        return f"{errors} errors and {warnings} warnings:\n{listed}"
 
     def _save_file(self):
-        if not self.current_file or not self.original_lines:
+        doc = self.doc
+        if doc.loader is not None:
+            messagebox.showwarning("Warning", "Please wait until the file has finished loading")
+            return
+        if not doc.current_file or not doc.original_text:
             messagebox.showwarning("Warning", "No file loaded")
             return
+        import validation
+        problems = self._check_settings(doc)
+        if validation.count(problems, validation.ERROR) and not messagebox.askyesno(
+                "Problems Found", f"{self._describe_problems(problems)}\n\nSave anyway?", icon=messagebox.WARNING):
+            return
         save_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
         )
         if not save_path:
             return
+        save_span = span('save', edited=sum(setting.dirty for setting in doc.store))
+        loaded_path = doc.current_file
+        source = doc.original_text
+        # checked before writing, the loaded file may have been moved or deleted while it was open
+        same_file = (os.path.exists(save_path) and os.path.exists(loaded_path)
+                     and os.path.samefile(save_path, loaded_path))
+        # the mapped file can't be replaced while it is mapped, so it is closed right before the rename and reopened
+        reopen = isinstance(source, MappedText) and same_file
         try:
-            new_lines = self.original_lines[:]
-            qmap = {
-                (s.setup_question.strip(), s.token.strip(), s.offset.strip()): s
-                for s in self.settings
-                if s.setup_question and s.token and s.offset
-            }
-            re_setup = re.compile(r'^Setup\s+Question\s*=\s*(.*)', re.IGNORECASE)
-            re_token = re.compile(r'^Token\s*=\s*(.*)', re.IGNORECASE)
-            re_offset = re.compile(r'^Offset\s*=\s*(.*)', re.IGNORECASE)
-            re_options_line = re.compile(r'^Options\s*=', re.IGNORECASE)
-            re_value_line = re.compile(r'^Value\s*=', re.IGNORECASE)
-            re_bracket_line = re.compile(r'^\s*\*?\[.*?\]')
-            current_setting = None
-            current_sq = None
-            current_token = None
-            current_offset = None
-            skip_lines_until = -1
-            i = 0
-            while i < len(new_lines):
-                if i <= skip_lines_until:
-                    i += 1
-                    continue
-                raw_line = new_lines[i]
-                line_stripped = self.re_comment.sub('', raw_line).strip()
-                if not line_stripped:
-                    i += 1
-                    continue
-                match_sq = re_setup.match(line_stripped)
-                if match_sq:
-                    current_sq = match_sq.group(1).strip()
-                    current_token = None
-                    current_offset = None
-                    current_setting = None
-                    i += 1
-                    continue
-                match_tk = re_token.match(line_stripped)
-                if match_tk:
-                    current_token = match_tk.group(1).strip()
-                    i += 1
-                    continue
-                match_off = re_offset.match(line_stripped)
-                if match_off:
-                    current_offset = match_off.group(1).strip()
-                    if current_sq and current_token and current_offset:
-                        current_setting = qmap.get((current_sq, current_token, current_offset))
-                    i += 1
-                    continue
-                if current_setting is None:
-                    i += 1
-                    continue
-                if re_options_line.match(line_stripped):
-                    option_block_end = i + 1
-                    while option_block_end < len(new_lines):
-                        next_line = self.re_comment.sub('', new_lines[option_block_end]).strip()
-                        if not re_bracket_line.match(next_line):
-                            break
-                        option_block_end += 1
-                    if current_setting.options:
-                        new_block = []
-                        for idx, opt in enumerate(current_setting.options):
-                            prefix = "Options\t=" if idx == 0 else "         "
-                            is_active = (current_setting.active_option == idx)
-                            original_line = new_lines[i].strip()
-                            comment_match = re.search(r'(//.*)$', original_line)
-                            comment = f"\t{comment_match.group(1)}" if idx == 0 and comment_match else ""
-                            line = f"{prefix}{'*' if is_active else ''}{opt}{comment}\n"
-                            new_block.append(line)
-                        new_lines[i:option_block_end] = new_block
-                        skip_lines_until = i + len(new_block) - 1
-                    i = option_block_end
-                    continue
-                if re_value_line.match(line_stripped):
-                    if current_setting.value is not None:
-                        comment_match = re.search(r'(//.*)$', raw_line)
-                        comment = f"{comment_match.group(1)}" if comment_match else ""
-                        leading_whitespace = re.match(r'^\s*', raw_line).group(0)
-                        new_lines[i] = (
-                            f"{leading_whitespace}Value\t={current_setting.value}"
-                            f"{f'\t{comment}' if comment else ''}\n"
-                        )
-                    i += 1
-                    continue
-                i += 1
-            with open(save_path, 'w', encoding='ansi') as f:
-                f.writelines(new_lines)
-            messagebox.showinfo("Success", f"File saved successfully to {save_path}")
+            written = nvram_writer.write(save_path, source, doc.store, nvram_parser.DEFAULT_ENCODING,
+                                         before_replace=(lambda: self._clear_loaded_file(doc)) if reopen else None)
         except Exception as e:
+            save_span.finish(failed=1)
+            print(f"Error saving {save_path}: {e}")
+            if reopen and doc.current_file is None:
+                # the mapping was closed but the file was not replaced, load it again as it was
+                self._open_file(loaded_path, doc)
+            self._show_status(save_span.describe())
             messagebox.showerror("Error", f"Failed to save file: {str(e)}")
+            return
+        # the file is saved from here on, nothing below may report it as failed
+        save_span.finish(bytes=written)
+        if reopen:
+            self._open_file(save_path, doc)
+        elif same_file:
+            self._rebase_saved(doc)
+        else:
+            doc.mark_saved()
+        rate = written / 1e6 / max(save_span.duration, 1e-9)
+        self._show_status(f"Saved {written / 1e6:.1f} MB in {save_span.duration * 1000:.0f} ms ({rate:.1f} MB/s)")
+        messagebox.showinfo("Success", f"File saved successfully to {save_path}")
+
+    def _rebase_saved(self, doc: Document):
+        """
+        makes the file just saved over the loaded one the new baseline: the settings take their spans in the
+        written text and are no longer edited, so closing the tab or reloading doesn't see them as unsaved
+        """
+        if doc.watcher is not None:
+            # our own write is not a change to reload
+            doc.watcher.rebase()
+        import dump_watcher
+        try:
+            new_text = nvram_parser.read_text(doc.current_file)
+            # only the edited records differ, they are parsed again and the spans behind them moved
+            patch = dump_watcher.patch_settings(doc.store, doc.original_text, new_text)
+        except Exception as e:
+            print(f"Error reading back {doc.current_file}: {e}")
+            patch = None
+        doc.mark_clean()
+        if patch is None:
+            # the records couldn't be matched up with the written file, load it again
+            self._reload_keeping_state(doc)
+            return
+        doc.original_text = new_text
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.preferences.flush()
 
 if __name__ == "__main__":
     app = BIOSSettingsManager()
@@ -0,0 +1,403 @@
+"""
+command line entry point: without a command the GUI is started, headless commands for scripting
+SCEWIN dumps are run as `python main.py <command> ...`.
+modules only some commands need (process pools, sqlite, the profiler) are imported by those commands,
+so starting the GUI doesn't pay for them
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+import nvram_diff
+import nvram_parser
+import nvram_writer
+from instrumentation import TRACER, span
+from presets import PresetEntry, apply_preset, load_preset
+from settings_store import SettingsStore
+
+
+def _expand_inputs(patterns: List[str]) -> List[str]:
+    # shells on windows don't expand wildcards, so do it here
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def apply_preset_to_file(path: str, entries: List[PresetEntry], out_path: str, encoding: str) -> dict:
+    """
+    loads one dump, applies the preset and writes the result, runs in a worker process
+    """
+    start = time.perf_counter()
+    try:
+        text = nvram_parser.read_text(path, encoding)
+        store = SettingsStore(nvram_parser.parse_text(text))
+        result = apply_preset(store, entries)
+        written = 0
+        write_start = time.perf_counter()
+        if result.changed or os.path.abspath(out_path) != os.path.abspath(path):
+            written = nvram_writer.write(out_path, text, store, encoding)
+        write_seconds = time.perf_counter() - write_start
+    except Exception as e:
+        return {'path': path, 'error': str(e), 'seconds': time.perf_counter() - start}
+    return {
+        'path': path,
+        'out_path': out_path,
+        'settings': len(store),
+        'bytes': len(text),
+        'written': written,
+        'write_seconds': write_seconds,
+        'seconds': time.perf_counter() - start,
+        'changed': result.changed,
+        'unchanged': result.unchanged,
+        'missing': result.missing,
+        'ambiguous': result.ambiguous,
+        'invalid': result.invalid,
+    }
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    entries = load_preset(args.preset)
+    inputs = _expand_inputs(args.dumps)
+    if args.name_from == 'dir':
+        import fleet_store
+    jobs = []
+    targets = {}
+    for path in inputs:
+        if args.in_place:
+            out_path = path
+        elif args.name_from == 'dir':
+            out_path = os.path.join(args.output_dir, fleet_store.machine_name(path, 'dir'), os.path.basename(path))
+        else:
+            out_path = os.path.join(args.output_dir, os.path.basename(path))
+        # two jobs writing the same file would leave only one of them, e.g. exports/*/nvram.txt
+        target = os.path.normcase(os.path.abspath(out_path))
+        if target in targets:
+            raise ValueError(f"{path} and {targets[target]} would both be written to {out_path}"
+                             + ("" if args.in_place or args.name_from == 'dir' else ", use --name-from dir"))
+        targets[target] = path
+        jobs.append((path, out_path))
+    for _, out_path in jobs:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(apply_preset_to_file, path, entries, out_path, args.encoding)
+                   for path, out_path in jobs]
+        for future in as_completed(futures):
+            res = future.result()
+            results.append(res)
+            if 'error' in res:
+                print(f"{res['path']}: FAILED {res['error']}")
+                continue
+            rate = res['bytes'] / 1e6 / max(res['seconds'], 1e-9)
+            print(f"{res['path']}: {res['settings']} settings in {res['seconds'] * 1000:.0f} ms ({rate:.1f} MB/s), "
+                  f"changed {res['changed']}, unchanged {res['unchanged']}, missing {len(res['missing'])}, "
+                  f"ambiguous {len(res['ambiguous'])}, invalid {len(res['invalid'])}")
+    elapsed = time.perf_counter() - started
+
+    done = [res for res in results if 'error' not in res]
+    total_bytes = sum(res['bytes'] for res in done)
+    written = sum(res['written'] for res in done)
+    write_seconds = sum(res['write_seconds'] for res in done)
+    print()
+    print(f"{len(done)}/{len(results)} files in {elapsed:.2f} s "
+          f"({len(done) / max(elapsed, 1e-9):.1f} files/s, {total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+    print(f"wrote {written / 1e6:.1f} MB at {written / 1e6 / max(write_seconds, 1e-9):.1f} MB/s per worker")
+    print(f"settings changed: {sum(res['changed'] for res in done)}, "
+          f"already set: {sum(res['unchanged'] for res in done)}")
+    for label in ('missing', 'ambiguous', 'invalid'):
+        counts = {}
+        for res in done:
+            for description in res[label]:
+                counts[description] = counts.get(description, 0) + 1
+        for description, count in sorted(counts.items()):
+            print(f"  {label}: {description} ({count} file{'s' if count != 1 else ''})")
+    return 0 if len(done) == len(results) else 1
+
+
+def _describe(key) -> str:
+    question, token, offset = key
+    return f"{question} [{token}/{offset}]"
+
+
+def cmd_diff(args: argparse.Namespace) -> int:
+    sides = []
+    for path in (args.old, args.new):
+        with span('read') as read_span:
+            text = nvram_parser.read_text(path, args.encoding)
+            read_span.count(chars=len(text))
+        with span('parse') as parse_span:
+            sides.append(list(nvram_parser.parse_text(text)))
+            parse_span.count(settings=len(sides[-1]))
+    old, new = sides
+    with span('diff', settings=len(old) + len(new)) as diff_span:
+        entries = nvram_diff.diff_settings(old, new)
+        diff_span.count(differences=len(entries))
+
+    if args.json:
+        print(json.dumps([{
+            'kind': entry.kind,
+            'question': entry.key[0],
+            'token': entry.key[1],
+            'offset': entry.key[2],
+            'old': entry.old_value if entry.old is not None else None,
+            'new': entry.new_value if entry.new is not None else None,
+            'options_changed': entry.options_changed,
+        } for entry in entries], indent=2))
+    else:
+        for entry in entries:
+            if entry.kind == nvram_diff.CHANGED:
+                line = f"~ {_describe(entry.key)}: {entry.old_value} -> {entry.new_value}"
+                if entry.options_changed:
+                    line += " (options changed)"
+            elif entry.kind == nvram_diff.ADDED:
+                line = f"+ {_describe(entry.key)}: {entry.new_value}"
+            else:
+                line = f"- {_describe(entry.key)}: {entry.old_value}"
+            print(line)
+        counts = {kind: 0 for kind in (nvram_diff.CHANGED, nvram_diff.ADDED, nvram_diff.REMOVED)}
+        for entry in entries:
+            counts[entry.kind] += 1
+        print(f"{counts[nvram_diff.CHANGED]} changed, {counts[nvram_diff.ADDED]} added, "
+              f"{counts[nvram_diff.REMOVED]} removed ({len(old)} vs {len(new)} settings, "
+              f"compared in {diff_span.duration * 1000:.0f} ms)", file=sys.stderr)
+    return 1 if entries else 0
+
+
+def validate_file(path: str, encoding: str) -> dict:
+    """
+    loads one dump and checks its settings, runs in a worker process
+    """
+    import validation
+    start = time.perf_counter()
+    try:
+        store = SettingsStore(nvram_parser.parse(path, encoding))
+        problems = validation.validate(store)
+    except Exception as e:
+        return {'path': path, 'error': str(e), 'seconds': time.perf_counter() - start}
+    return {
+        'path': path,
+        'settings': len(store),
+        'seconds': time.perf_counter() - start,
+        'problems': [{'question': problem.key[0], 'token': problem.key[1], 'offset': problem.key[2],
+                      'severity': problem.severity, 'message': problem.message} for problem in problems],
+    }
+
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    inputs = _expand_inputs(args.dumps)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(validate_file, path, args.encoding) for path in inputs]
+        for future in as_completed(futures):
+            res = future.result()
+            results.append(res)
+            if args.json:
+                continue
+            if 'error' in res:
+                print(f"{res['path']}: FAILED {res['error']}")
+                continue
+            for problem in res['problems']:
+                if problem['severity'] == 'warning' and not args.warnings:
+                    continue
+                key = (problem['question'], problem['token'], problem['offset'])
+                print(f"{res['path']}: {problem['severity']}: {_describe(key)}: {problem['message']}")
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    results.sort(key=lambda res: res['path'])
+
+    done = [res for res in results if 'error' not in res]
+    errors = sum(problem['severity'] == 'error' for res in done for problem in res['problems'])
+    warnings = sum(problem['severity'] == 'warning' for res in done for problem in res['problems'])
+    settings = sum(res['settings'] for res in done)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    print(f"checked {len(done)}/{len(results)} files ({settings} settings) in {elapsed:.2f} s "
+          f"({settings / elapsed:.0f} settings/s): {errors} errors, {warnings} warnings",
+          file=sys.stderr if args.json else sys.stdout)
+    return 1 if errors or len(done) != len(results) else 0
+
+
+def _read_for_ingest(path: str, encoding: str, known_digest: Optional[str]) -> tuple:
+    # runs in a worker process, errors are returned so one bad dump doesn't stop the ingest
+    import fleet_store
+    start = time.perf_counter()
+    try:
+        digest, rows = fleet_store.read_dump(path, encoding, known_digest)
+    except Exception as e:
+        return path, None, str(e), time.perf_counter() - start
+    return path, digest, rows, time.perf_counter() - start
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import fleet_store
+    inputs = _expand_inputs(args.dumps)
+    names = {}
+    for path in inputs:
+        name = fleet_store.machine_name(path, args.name_from)
+        if name in names:
+            raise ValueError(f"{path} and {names[name]} would both be stored as machine {name!r}, "
+                             f"use --name-from dir or path")
+        names[name] = path
+
+    started = time.perf_counter()
+    stored = skipped = failed = settings = total_bytes = 0
+    with fleet_store.FleetStore(args.database) as store, ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        # dumps whose contents are already stored are only hashed, not parsed
+        known = store.digests()
+        futures = [pool.submit(_read_for_ingest, path, args.encoding, known.get(name))
+                   for name, path in names.items()]
+        for future in as_completed(futures):
+            path, digest, rows, seconds = future.result()
+            if digest is None:
+                print(f"{path}: FAILED {rows}")
+                failed += 1
+                continue
+            if rows is None:
+                skipped += 1
+                continue
+            name = fleet_store.machine_name(path, args.name_from)
+            store.add_machine(name, os.path.abspath(path), digest, rows)
+            stored += 1
+            settings += len(rows)
+            total_bytes += os.path.getsize(path)
+            if args.verbose:
+                print(f"{path}: {len(rows)} settings as {name!r} in {seconds * 1000:.0f} ms")
+        store.commit()
+        machines = store.machine_count()
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"ingested {stored} dumps ({settings} settings) in {elapsed:.2f} s: {stored / elapsed:.1f} dumps/s, "
+          f"{settings / elapsed:.0f} settings/s, {total_bytes / 1e6 / elapsed:.1f} MB/s")
+    print(f"{skipped} unchanged, {failed} failed, {machines} machines in {args.database}")
+    return 1 if failed else 0
+
+
+def cmd_query(args: argparse.Namespace) -> int:
+    import fleet_store
+    if not os.path.exists(args.database):
+        raise OSError(f"no such database: {args.database}")
+    with fleet_store.FleetStore(args.database) as store:
+        if args.option is not None:
+            rows = store.machines_with(args.option, args.question, args.token)
+            if args.json:
+                print(json.dumps([{'machine': machine, 'question': question, 'token': token, 'offset': offset,
+                                   'option': label} for machine, question, token, offset, label in rows], indent=2))
+            else:
+                for machine, question, token, offset, label in rows:
+                    print(f"{machine}: {_describe((question, token, offset))} = {label}")
+                print(f"{len({row[0] for row in rows})} of {store.machine_count()} machines", file=sys.stderr)
+            return 0 if rows else 1
+        rows = store.distribution(args.question, args.token)
+        if args.json:
+            print(json.dumps([{'question': question, 'token': token, 'offset': offset, 'choice': choice,
+                               'machines': count} for question, token, offset, choice, count in rows], indent=2))
+        else:
+            current = None
+            for question, token, offset, choice, count in rows:
+                if (question, token, offset) != current:
+                    current = (question, token, offset)
+                    print(_describe(current))
+                print(f"  {count:6d}  {choice}")
+        return 0 if rows else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='scewin-gui', description="Edit SCEWIN NVRAM dumps, "
+                                     "starts the GUI when no command is given")
+    parser.add_argument('--trace', metavar='FILE', help="write timings of load, parse, filter, select, save "
+                        "etc. as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)")
+    parser.add_argument('--profile', metavar='FILE', help="run under cProfile and write the stats to FILE "
+                        "(read with python -m pstats)")
+    commands = parser.add_subparsers(dest='command')
+
+    batch = commands.add_parser('batch', help="apply a preset to many dumps in parallel")
+    batch.add_argument('preset', help="JSON preset file")
+    batch.add_argument('dumps', nargs='+', help="NVRAM dumps, wildcards are expanded")
+    target = batch.add_mutually_exclusive_group(required=True)
+    target.add_argument('-o', '--output-dir', help="write the changed dumps to this directory")
+    target.add_argument('--in-place', action='store_true', help="overwrite the input dumps")
+    batch.add_argument('--name-from', choices=('file', 'dir'), default='file',
+                       help="with -o, write each dump under its file name (default) or to a subdirectory named "
+                       "after its directory, for exports that are all called nvram.txt")
+    batch.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    batch.add_argument('--encoding', default=nvram_parser.DEFAULT_ENCODING)
+    batch.set_defaults(func=cmd_batch)
+
+    diff = commands.add_parser('diff', help="show the settings that differ between two dumps")
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('--json', action='store_true', help="print the differences as JSON")
+    diff.add_argument('--encoding', default=nvram_parser.DEFAULT_ENCODING)
+    diff.set_defaults(func=cmd_diff)
+
+    validate = commands.add_parser('validate', help="check many dumps for values that don't fit their width, "
+                                   "options out of range and duplicate settings, in parallel")
+    validate.add_argument('dumps', nargs='+', help="NVRAM dumps, wildcards are expanded")
+    validate.add_argument('-w', '--warnings', action='store_true', help="also print warnings, not just errors")
+    validate.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    validate.add_argument('--json', action='store_true', help="print every problem as JSON")
+    validate.add_argument('--encoding', default=nvram_parser.DEFAULT_ENCODING)
+    validate.set_defaults(func=cmd_validate)
+
+    ingest = commands.add_parser('ingest', help="store the settings of many dumps in a SQLite database")
+    ingest.add_argument('database', help="SQLite file, created if missing")
+    ingest.add_argument('dumps', nargs='+', help="NVRAM dumps, one per machine, wildcards are expanded")
+    ingest.add_argument('--name-from', choices=('file', 'dir', 'path'), default='file',
+                        help="name machines after the dump's file name (default), its directory or its full path")
+    ingest.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    ingest.add_argument('-v', '--verbose', action='store_true', help="print every ingested dump")
+    ingest.add_argument('--encoding', default=nvram_parser.DEFAULT_ENCODING)
+    ingest.set_defaults(func=cmd_ingest)
+
+    query = commands.add_parser('query', help="query a database made by ingest")
+    query.add_argument('database')
+    query.add_argument('-q', '--question', help="setup question of the setting")
+    query.add_argument('-t', '--token', help="token of the setting")
+    query.add_argument('-o', '--option', help="list the machines with this option set, "
+                       "without it the distribution of values is shown")
+    query.add_argument('--json', action='store_true', help="print the result as JSON")
+    query.set_defaults(func=cmd_query)
+    return parser
+
+
+def run_gui(args: argparse.Namespace) -> int:
+    # time to the first drawn window, shown in the status bar
+    startup_span = span('startup')
+    from bios_settings_manager import BIOSSettingsManager
+    app = BIOSSettingsManager()
+    app.root.after_idle(lambda: app._show_status(startup_span.finish().describe()))
+    app.run()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    func = getattr(args, 'func', run_gui)
+    if args.trace:
+        TRACER.record_events()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        return func(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.trace:
+            TRACER.write_trace(args.trace)
@@ -0,0 +1,161 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List, Optional, Tuple
+from models import BIOSSetting
+
+
+class DetailsPanel(ttk.Frame):
+    """
+    the details text and option editor of the selected setting.
+    widgets are built once and reused: radiobuttons come from a pool that only grows, option lists longer
+    than LONG_OPTIONS go into one scrollable Listbox, and only the detail lines that changed are rewritten,
+    so moving through the list does not create or destroy widgets.
+    """
+    LONG_OPTIONS = 24
+
+    def __init__(self, master, on_option: Callable[[BIOSSetting, int], None],
+                 on_value: Callable[[BIOSSetting, str], None]):
+        super().__init__(master)
+        self.on_option = on_option
+        self.on_value = on_value
+        self.setting: Optional[BIOSSetting] = None
+        self._lines: List[str] = []
+        # option lists currently in the radiobuttons and in the listbox
+        self._radio_options: Optional[Tuple[int, ...]] = None
+        self._list_options: Optional[Tuple[int, ...]] = None
+
+        self.details_text = tk.Text(self, wrap=tk.WORD, height=10, state=tk.DISABLED)
+        self.details_text.pack(fill=tk.X, padx=5, pady=5)
+        self.options_frame = ttk.LabelFrame(self, text="Options")
+        self.options_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.option_var = tk.IntVar(value=-1)
+        self._radiobuttons: List[ttk.Radiobutton] = []
+        self._radio_texts: List[str] = []
+        self._radios_shown = 0
+
+        self.list_frame = ttk.Frame(self.options_frame)
+        self.listbox = tk.Listbox(self.list_frame, selectmode=tk.BROWSE, exportselection=False, activestyle='none')
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        list_scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.listbox.yview)
+        list_scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.listbox.configure(yscrollcommand=list_scrollbar.set)
+        self.listbox.bind('<<ListboxSelect>>', self._on_list_select)
+
+        self.value_frame = ttk.Frame(self.options_frame)
+        self.value_var = tk.StringVar()
+        ttk.Entry(self.value_frame, textvariable=self.value_var).pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(self.value_frame, text="Update Value", command=self._on_value).pack()
+
+    def show(self, setting: Optional[BIOSSetting]):
+        self.setting = setting
+        self._show_details(self._detail_lines(setting) if setting is not None else [])
+        if setting is None:
+            self._show_editor(None)
+        elif setting.options:
+            self._show_options(setting)
+        elif setting.value is not None:
+            self._show_editor(self.value_frame)
+            self.value_var.set(setting.value)
+        else:
+            self._show_editor(None)
+
+    @staticmethod
+    def _detail_lines(setting: BIOSSetting) -> List[str]:
+        lines = [
+            f"Setup Question: {setting.setup_question}",
+            f"Help String: {setting.help_string}",
+            f"Token: {setting.token}",
+            f"Offset: {setting.offset}",
+            f"Width: {setting.width}"
+        ]
+        if setting.bios_default is not None:
+            lines.append(f"BIOS Default: {setting.bios_default}")
+        if setting.value:
+            lines.append(f"Value: {setting.value}")
+        return lines
+
+    def _show_details(self, lines: List[str]):
+        text = self.details_text
+        if lines == self._lines:
+            return
+        text.config(state=tk.NORMAL)
+        if len(lines) == len(self._lines):
+            # same fields, rewrite just the lines that differ
+            for number, (old, new) in enumerate(zip(self._lines, lines), 1):
+                if old != new:
+                    text.delete(f"{number}.0", f"{number}.end")
+                    text.insert(f"{number}.0", new)
+        else:
+            text.delete('1.0', tk.END)
+            text.insert('1.0', "\n".join(lines) + "\n" if lines else "")
+        text.config(state=tk.DISABLED)
+        self._lines = lines
+
+    def _show_editor(self, widget: Optional[tk.Widget]):
+        """shows one of the radiobuttons, the listbox or the value entry and hides the others"""
+        if widget is not self.list_frame:
+            self.list_frame.pack_forget()
+        if widget is not self.value_frame:
+            self.value_frame.pack_forget()
+        if widget is not None and widget is not self.options_frame:
+            widget.pack(fill=tk.BOTH, expand=True)
+        if widget is not self.options_frame:
+            self._show_radiobuttons(0)
+
+    def _show_options(self, setting: BIOSSetting):
+        active = setting.active_option if setting.active_option is not None else -1
+        if len(setting.option_ids) > self.LONG_OPTIONS:
+            self._show_editor(self.list_frame)
+            if self._list_options != setting.option_ids:
+                self.listbox.delete(0, tk.END)
+                self.listbox.insert(tk.END, *setting.options)
+                self._list_options = setting.option_ids
+            self.listbox.selection_clear(0, tk.END)
+            if 0 <= active < self.listbox.size():
+                self.listbox.selection_set(active)
+                self.listbox.see(active)
+            return
+        self._show_editor(self.options_frame)
+        if self._radio_options != setting.option_ids:
+            labels = setting.options
+            self._show_radiobuttons(len(labels))
+            for i, label in enumerate(labels):
+                if self._radio_texts[i] != label:
+                    self._radiobuttons[i].configure(text=label)
+                    self._radio_texts[i] = label
+            self._radio_options = setting.option_ids
+        self.option_var.set(active)
+
+    def _show_radiobuttons(self, count: int):
+        if count == self._radios_shown:
+            return
+        if count == 0:
+            self._radio_options = None
+        while len(self._radiobuttons) < count:
+            index = len(self._radiobuttons)
+            self._radiobuttons.append(ttk.Radiobutton(self.options_frame, value=index, variable=self.option_var,
+                                                      command=lambda i=index: self._choose(i)))
+            self._radio_texts.append("")
+        for rb in self._radiobuttons[count:self._radios_shown]:
+            rb.pack_forget()
+        for rb in self._radiobuttons[self._radios_shown:count]:
+            rb.pack(anchor=tk.W)
+        self._radios_shown = count
+
+    def _choose(self, index: int):
+        if self.setting is not None:
+            self.on_option(self.setting, index)
+
+    def _on_list_select(self, event):
+        selection = self.listbox.curselection()
+        if selection and self.setting is not None and selection[0] != self.setting.active_option:
+            self._choose(selection[0])
+
+    def _on_value(self):
+        if self.setting is not None:
+            self.on_value(self.setting, self.value_var.get())
+
+    def refresh(self):
+        """shows the selected setting again after it was edited elsewhere"""
+        self.show(self.setting)
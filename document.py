@@ -0,0 +1,99 @@
+import os
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+from edit_journal import EditJournal
+from file_loader import BackgroundLoader
+from fuzzy_search import FuzzySearchWorker
+from instrumentation import Span
+from mapped_dump import MappedText
+from search_index import SearchIndex
+from settings_store import SettingsStore
+
+if TYPE_CHECKING:
+    from dump_watcher import FileWatcher
+    from validation import Problem
+
+
+class Document:
+    """
+    one open dump: its settings, text, indexes and edit history, plus the list state of its tab.
+    documents don't copy what dumps have in common, questions, help strings and other field values are
+    interned and option labels and option lists live once in OPTION_LABELS, so a second board or a
+    before/after pair mostly costs the settings objects and the search postings.
+    switching tabs swaps documents in and out of the shared list and details widgets without
+    parsing or indexing anything again.
+    """
+
+    def __init__(self):
+        self.store = SettingsStore()
+        # undo/redo history of the edits to this dump
+        self.journal = EditJournal(self.store)
+        # the dump exactly as read from disk, settings keep their spans into it.
+        # for big files this is a MappedText that decodes slices straight from the mapped file
+        self.original_text = ""
+        self.current_file: Optional[str] = None
+        self.search_index = SearchIndex()
+        # ranks free text queries off the Tk thread once the dump is loaded
+        self.fuzzy_search = FuzzySearchWorker()
+        self.search_span: Optional[Span] = None
+        self.loader: Optional[BackgroundLoader] = None
+        # times a load from opening the file until the last row is in the list
+        self.load_span: Optional[Span] = None
+        # notices when the loaded file is rewritten, e.g. by a new SCEWIN export
+        self.watcher: Optional['FileWatcher'] = None
+        # run once the current load finished, restores the state kept across a reload
+        self.after_load: Optional[Callable[[], None]] = None
+        # store ids of the settings matching the filter, a range while nothing is filtered.
+        # ids are in file order, or in rank order when `ranked`
+        self.view: Sequence[int] = range(0)
+        self.ranked = False
+        # the list state while another tab is shown
+        self.search_text = ""
+        self.selected: Optional[int] = None
+        self.top = 0
+        # (active option, value) of the settings edited when they were last saved to another file
+        self.saved_values: Dict[int, Tuple[Optional[int], Optional[str]]] = {}
+        # found by the last check, their rows are highlighted
+        self.problems: List['Problem'] = []
+        # set when the filter has to run again once the tab is shown, e.g. a search didn't finish
+        self.filter_pending = False
+
+    @property
+    def title(self) -> str:
+        return os.path.basename(self.current_file) if self.current_file else "Untitled"
+
+    @property
+    def empty(self) -> bool:
+        return self.current_file is None and self.loader is None and not len(self.store)
+
+    def edited(self) -> int:
+        """number of settings changed since the dump was loaded or last saved"""
+        saved = self.saved_values
+        if not saved:
+            return sum(setting.dirty for setting in self.store)
+        return sum(setting.dirty and saved.get(setting.sid) != (setting.active_option, setting.value)
+                   for setting in self.store)
+
+    def mark_saved(self):
+        """
+        remembers the edits as saved to another file. they stay dirty, the loaded file still has the old values,
+        but `edited` only counts what changed after this
+        """
+        self.saved_values = {setting.sid: (setting.active_option, setting.value)
+                             for setting in self.store if setting.dirty}
+
+    def mark_clean(self):
+        """the edits were saved over the loaded file, which is now what the settings are compared with"""
+        for setting in self.store:
+            setting.dirty = False
+        self.saved_values = {}
+        self.journal.mark_saved()
+
+    def close(self):
+        """cancels loading and releases the worker thread and the mapped file"""
+        if self.loader is not None:
+            # a mapping still being scanned is closed by its loader
+            self.loader.cancel()
+        elif isinstance(self.original_text, MappedText):
+            self.original_text.close()
+        self.fuzzy_search.close()
+        self.original_text = ""
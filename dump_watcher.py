@@ -0,0 +1,223 @@
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+import nvram_parser
+from models import NO_OFFSET, BIOSSetting
+from settings_store import SettingsStore
+
+# fields taken over from the re-parsed record, everything else (sid, dirty) belongs to the loaded setting
+RECORD_FIELDS = ('setup_question', 'help_string', 'token', 'offset', 'width', 'bios_default',
+                 'option_ids', 'active_option', 'value', 'content', 'preview', 'spans')
+# slices compared at once while looking for the changed part of a file
+BLOCK = 64 * 1024
+
+
+class FileWatcher:
+    """
+    notices when a file changes on disk by polling its size and mtime.
+    a change is only reported once the file stopped changing between two polls, so a dump that is
+    still being written by SCEWIN isn't read half way
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = self._stat()
+        self._pending: Optional[Tuple[int, int]] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def rebase(self):
+        """accepts the file as it is now, e.g. after saving over it"""
+        self.signature = self._stat()
+        self._pending = None
+
+    def poll(self) -> bool:
+        current = self._stat()
+        if current == self.signature or current is None:
+            # a missing file is usually being replaced, wait for the new one
+            self._pending = None
+            return False
+        if current != self._pending:
+            self._pending = current
+            return False
+        self.signature = current
+        self._pending = None
+        return True
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i:i + BLOCK] == b[i:i + BLOCK]:
+        i += BLOCK
+    lo, hi = i, min(i + BLOCK, n)
+    # a[i:lo] == b[i:lo] holds, find the longest such lo
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[i:mid] == b[i:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """length of the common end of a and b, at most limit"""
+    la, lb = len(a), len(b)
+    i = 0
+    while i < limit:
+        step = min(BLOCK, limit - i)
+        if a[la - i - step:la - i] != b[lb - i - step:lb - i]:
+            break
+        i += step
+    else:
+        return i
+    lo, hi = i, min(i + BLOCK, limit)
+    # a[la - lo:la - i] == b[lb - lo:lb - i] holds, find the longest such lo
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[la - mid:la - i] == b[lb - mid:lb - i]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _shift(setting: BIOSSetting, delta: int):
+    spans = setting.spans
+    if spans is None:
+        return
+    for slot in range(len(spans)):
+        if spans[slot] != NO_OFFSET:
+            spans[slot] += delta
+
+
+def _same_record(old: BIOSSetting, new: BIOSSetting) -> bool:
+    return all(getattr(old, name) == getattr(new, name) for name in RECORD_FIELDS if name != 'spans')
+
+
+@dataclass
+class Patch:
+    # ids of the settings whose record changed on disk and was re-parsed
+    changed: List[int] = field(default_factory=list)
+    # edited settings that were overwritten because their record also changed on disk
+    conflicts: List[int] = field(default_factory=list)
+    # characters re-parsed out of the whole file
+    parsed: int = 0
+
+
+def patch_settings(store: SettingsStore, old_text: str, new_text: str) -> Optional[Patch]:
+    """
+    updates the settings parsed from `old_text` to match `new_text` by re-parsing only the records
+    around the part of the file that changed, then moving the spans of the records behind it.
+    unchanged settings keep their edits, an edited setting whose record changed takes the new record.
+    returns None, leaving the store untouched, when records were added, removed or renamed and
+    the file has to be loaded again
+    """
+    settings = list(store)
+    if not settings or any(setting.spans is None for setting in settings):
+        return None
+    starts = [setting.spans[0] for setting in settings]
+    prefix = _common_prefix(old_text, new_text)
+    if prefix == len(old_text) == len(new_text):
+        return Patch()
+    suffix = _common_suffix(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    old_end = len(old_text) - suffix
+    if prefix < starts[0]:
+        # the header above the first setting changed
+        return None
+    # the records overlapping the changed part. a change starting right at a record's start may also be
+    # text appended to the end of the record before it, so that one is parsed again too
+    first = max(bisect_left(starts, prefix) - 1, 0)
+    last = max(bisect_right(starts, old_end) - 1, first)
+    delta = len(new_text) - len(old_text)
+    region_start = starts[first]
+    region_end = settings[last].spans[1] + delta
+    if region_end < region_start or region_end > len(new_text):
+        return None
+    reparsed = list(nvram_parser.parse_text(new_text[region_start:region_end]))
+    if len(reparsed) != last - first + 1:
+        return None
+    for old, new in zip(settings[first:last + 1], reparsed):
+        if old.key != new.key:
+            return None
+
+    patch = Patch(parsed=region_end - region_start)
+    for old, new in zip(settings[first:last + 1], reparsed):
+        _shift(new, region_start)
+        old_record = old_text[old.spans[0]:old.spans[1]]
+        new_record = new_text[new.spans[0]:new.spans[1]]
+        if old_record == new_record:
+            old.spans = new.spans
+            continue
+        if old.dirty and not _same_record(old, new):
+            patch.conflicts.append(old.sid)
+        for name in RECORD_FIELDS:
+            setattr(old, name, getattr(new, name))
+        old.dirty = False
+        patch.changed.append(old.sid)
+    if delta:
+        for setting in settings[last + 1:]:
+            _shift(setting, delta)
+    return patch
+
+
+@dataclass
+class PendingEdit:
+    key: Tuple[str, str, str]
+    # position among the settings sharing the key
+    ordinal: int
+    # the record as it was on disk when loaded, None when that can't be read back any more
+    record: Optional[str]
+    active_option: Optional[int]
+    value: Optional[str]
+
+
+def collect_edits(store: SettingsStore, text) -> List[PendingEdit]:
+    """
+    remembers the unsaved edits before a dump is loaded again, see `restore_edits`
+    """
+    edits = []
+    for setting in store:
+        if not setting.dirty:
+            continue
+        same_key = store.by_key(*setting.key)
+        ordinal = next(i for i, other in enumerate(same_key) if other is setting)
+        record = text[setting.spans[0]:setting.spans[1]] if isinstance(text, str) and setting.spans else None
+        edits.append(PendingEdit(setting.key, ordinal, record, setting.active_option, setting.value))
+    return edits
+
+
+def restore_edits(edits: List[PendingEdit], store: SettingsStore, text,
+                  materialize: Callable[[BIOSSetting], object] = lambda setting: setting
+                  ) -> Tuple[List[int], List[PendingEdit]]:
+    """
+    applies edits collected before a reload to the settings with the same key whose record did not
+    change on disk, returns the ids of the edited settings and the edits that could not be applied.
+    `materialize` decodes lazily loaded settings before they are edited
+    """
+    applied, dropped = [], []
+    for edit in edits:
+        same_key = store.by_key(*edit.key)
+        setting = same_key[edit.ordinal] if edit.ordinal < len(same_key) else None
+        if setting is None or setting.spans is None:
+            dropped.append(edit)
+            continue
+        if edit.record is not None and text[setting.spans[0]:setting.spans[1]] != edit.record:
+            dropped.append(edit)
+            continue
+        materialize(setting)
+        if edit.active_option is not None and edit.active_option >= len(setting.option_ids):
+            dropped.append(edit)
+            continue
+        setting.active_option = edit.active_option
+        setting.value = edit.value
+        setting.dirty = True
+        applied.append(setting.sid)
+    return applied, dropped
@@ -0,0 +1,166 @@
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Iterator, List, Optional
+from models import BIOSSetting
+from settings_store import SettingsStore
+
+# fields an edit can change, active options are packed as ints with -1 for None
+ACTIVE_OPTION = 'active_option'
+VALUE = 'value'
+
+
+class JournalEntry:
+    """
+    changes of one field on one or more settings, kept as parallel arrays of setting ids,
+    old and new values and the old dirty flags instead of copies of the settings
+    """
+    __slots__ = ('label', 'field', 'sids', 'olds', 'news', 'was_dirty')
+
+    def __init__(self, label: str, field: str):
+        self.label = label
+        self.field = field
+        self.sids = array('I')
+        self.olds = array('i') if field == ACTIVE_OPTION else []
+        self.news = array('i') if field == ACTIVE_OPTION else []
+        self.was_dirty = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.sids)
+
+    def add(self, setting: BIOSSetting, old: Any, new: Any, was_dirty: bool):
+        if self.field == ACTIVE_OPTION:
+            old = -1 if old is None else old
+            new = -1 if new is None else new
+        self.sids.append(setting.sid)
+        self.olds.append(old)
+        self.news.append(new)
+        self.was_dirty.append(was_dirty)
+
+    def _unpack(self, value: Any) -> Any:
+        if self.field == ACTIVE_OPTION and value == -1:
+            return None
+        return value
+
+    def undo(self, store: SettingsStore) -> List[int]:
+        for sid, old, was_dirty in zip(reversed(self.sids), reversed(self.olds), reversed(self.was_dirty)):
+            setting = store[sid]
+            setattr(setting, self.field, self._unpack(old))
+            setting.dirty = bool(was_dirty)
+        return list(self.sids)
+
+    def redo(self, store: SettingsStore) -> List[int]:
+        for sid, new in zip(self.sids, self.news):
+            setting = store[sid]
+            setattr(setting, self.field, self._unpack(new))
+            setting.dirty = True
+        return list(self.sids)
+
+
+class EditJournal:
+    """
+    undo/redo history of the edits made to the settings of one store.
+    every step is a list of entries, one per changed field. edits inside `with journal.group(...)`
+    become a single step, e.g. a bulk edit.
+    the history keeps at most `limit` changed values, the oldest steps are dropped past that
+    """
+
+    def __init__(self, store: SettingsStore, limit: int = 100_000):
+        self.store = store
+        self.limit = limit
+        self._undo: Deque[List[JournalEntry]] = deque()
+        self._redo: List[List[JournalEntry]] = []
+        self._size = 0
+        self._group: Optional[str] = None
+        self._open: List[JournalEntry] = []
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+
+    def mark_saved(self):
+        """
+        the edited values were just saved as the new file, so undoing any step now leaves a setting
+        that differs from the file and has to be written again
+        """
+        for step in (*self._undo, *self._redo):
+            for entry in step:
+                entry.was_dirty = bytearray(b'\x01' * len(entry))
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1][0].label if self._undo else None
+
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1][0].label if self._redo else None
+
+    @contextmanager
+    def group(self, label: str) -> Iterator[None]:
+        self._group = label
+        self._open = []
+        try:
+            yield
+        finally:
+            self._group = None
+            self._push(self._open)
+            self._open = []
+
+    def record(self, setting: BIOSSetting, field: str, old: Any, new: Any, was_dirty: bool):
+        """
+        records a change that was just made to `setting`, call it only if the value actually changed
+        """
+        if self._group is None:
+            entry = JournalEntry(f"Edit {setting.setup_question.strip()}", field)
+            entry.add(setting, old, new, was_dirty)
+            self._push([entry])
+            return
+        entry = next((entry for entry in self._open if entry.field == field), None)
+        if entry is None:
+            entry = JournalEntry(self._group, field)
+            self._open.append(entry)
+        entry.add(setting, old, new, was_dirty)
+
+    @staticmethod
+    def _step_size(step: List[JournalEntry]) -> int:
+        return sum(len(entry) for entry in step)
+
+    def _push(self, step: List[JournalEntry]):
+        if not self._step_size(step):
+            return
+        self._undo.append(step)
+        self._size += self._step_size(step)
+        # a new edit makes the undone steps unreachable
+        self._redo.clear()
+        while self._size > self.limit and len(self._undo) > 1:
+            self._size -= self._step_size(self._undo.popleft())
+
+    def undo(self) -> List[int]:
+        """undoes the newest step, returns the ids of the settings it touched"""
+        if not self._undo:
+            return []
+        step = self._undo.pop()
+        self._size -= self._step_size(step)
+        self._redo.append(step)
+        sids = []
+        for entry in reversed(step):
+            sids.extend(entry.undo(self.store))
+        return sids
+
+    def redo(self) -> List[int]:
+        if not self._redo:
+            return []
+        step = self._redo.pop()
+        self._undo.append(step)
+        self._size += self._step_size(step)
+        sids = []
+        for entry in step:
+            sids.extend(entry.redo(self.store))
+        return sids
@@ -0,0 +1,145 @@
+import io
+import queue
+import threading
+from typing import Iterable, Iterator, List, Optional
+import mapped_dump
+import nvram_parser
+from instrumentation import span
+from mapped_dump import MappedText
+from models import BIOSSetting
+from parse_cache import ParseCache
+
+
+class BackgroundLoader:
+    """
+    reads and parses an NVRAM dump on a worker thread.
+    results are pushed onto `messages` as tuples so the Tk thread can poll them with root.after:
+        ('text', original_text)
+        ('batch', [BIOSSetting, ...], done, total)
+        ('done',) / ('cancelled',) / ('error', exception)
+    with lazy=True the file is memory-mapped instead of read, original_text is a MappedText and the
+    settings only carry their key fields until materialized. progress is then counted in bytes, not lines.
+    a mapped file is closed by the loader if loading does not complete.
+    with a ParseCache, a fully read file whose contents were parsed before is loaded from the cache instead.
+    """
+
+    def __init__(self, filename: str, encoding: str = nvram_parser.DEFAULT_ENCODING, batch_size: int = 500,
+                 lazy: bool = False, cache: Optional[ParseCache] = None):
+        self.filename = filename
+        self.encoding = encoding
+        self.batch_size = batch_size
+        self.lazy = lazy
+        self.cache = cache
+        self.messages: queue.Queue = queue.Queue()
+        # lines (or bytes when lazy) parsed so far
+        self.progress = 0
+        # settings pushed onto the queue so far
+        self.streamed = 0
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        for self.progress, line in enumerate(lines, 1):
+            yield line
+
+    def _count_settings(self, settings: List[BIOSSetting]) -> Iterator[BIOSSetting]:
+        for self.progress, setting in enumerate(settings, 1):
+            yield setting
+
+    @staticmethod
+    def _snapshot(settings: Iterable[BIOSSetting], rows: List[tuple]) -> Iterator[BIOSSetting]:
+        # settings are recorded for the cache before the GUI gets a chance to edit them
+        for setting in settings:
+            rows.append(ParseCache.snapshot(setting))
+            yield setting
+
+    def _count_bytes(self, settings: Iterable[BIOSSetting]) -> Iterator[BIOSSetting]:
+        for setting in settings:
+            self.progress = setting.span[1]
+            yield setting
+
+    def _run(self):
+        if self.lazy:
+            self._run_mapped()
+            return
+        try:
+            with span('read') as read_span:
+                with open(self.filename, 'rb') as f:
+                    data = f.read()
+                text = data.decode(self.encoding)
+                read_span.count(bytes=len(data))
+            self.messages.put(('text', text))
+            key = self.cache.key(data, self.encoding) if self.cache is not None else None
+            del data
+            with span('cache') as cache_span:
+                cached = self.cache.load(key) if key is not None else None
+                cache_span.count(hit=int(cached is not None))
+            if cached is not None:
+                with span('parse', cached=1) as parse_span:
+                    self._stream(self._count_settings(cached), len(cached))
+                    parse_span.count(settings=self.streamed)
+                return
+            lines = io.StringIO(text, newline='').readlines()
+            settings = nvram_parser.parse_lines(self._count_lines(lines))
+            with span('parse', lines=len(lines)) as parse_span:
+                if key is None:
+                    self._stream(settings, len(lines))
+                    parse_span.count(settings=self.streamed)
+                    return
+                rows: List[tuple] = []
+                completed = self._stream(self._snapshot(settings, rows), len(lines))
+                parse_span.count(settings=self.streamed)
+            if completed:
+                with span('cache store', settings=len(rows)):
+                    self.cache.store(key, rows)
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def _run_mapped(self):
+        try:
+            source = MappedText(self.filename, self.encoding)
+        except Exception as e:
+            self.messages.put(('error', e))
+            return
+        settings = mapped_dump.scan(source)
+        completed = False
+        try:
+            self.messages.put(('text', source))
+            with span('scan', bytes=len(source)) as scan_span:
+                completed = self._stream(self._count_bytes(settings), len(source))
+                scan_span.count(settings=self.streamed)
+        except Exception as e:
+            self.messages.put(('error', e))
+        finally:
+            if not completed:
+                # the scan holds a view of the mapping, it has to go before the mapping can close
+                settings.close()
+                source.close()
+
+    def _stream(self, settings: Iterable[BIOSSetting], total: int) -> bool:
+        """
+        pushes settings in batches, returns False if loading was cancelled
+        """
+        batch: List = []
+        for setting in settings:
+            if self._cancel.is_set():
+                self.messages.put(('cancelled',))
+                return False
+            batch.append(setting)
+            self.streamed += 1
+            if len(batch) >= self.batch_size:
+                self.messages.put(('batch', batch, self.progress, total))
+                batch = []
+        self.messages.put(('batch', batch, total, total))
+        self.messages.put(('done',))
+        return True
@@ -0,0 +1,216 @@
+"""
+SQLite database of the dumps of many machines, filled by `python main.py ingest` and read by `python main.py query`
+"""
+import hashlib
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from models import RE_BRACKET_PREFIX
+import nvram_parser
+
+# bump when the tables change, older databases are rejected instead of being misread
+SCHEMA_VERSION = 1
+# settings inserted per transaction while ingesting
+BATCH_ROWS = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    settings INTEGER NOT NULL,
+    ingested REAL NOT NULL DEFAULT (julianday('now'))
+);
+-- a setting is identified by its question, token and offset, like in the diff
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    token TEXT NOT NULL,
+    offset TEXT NOT NULL,
+    UNIQUE (question, token, offset)
+);
+-- option labels, `name` is the lowercased label without its [xx] prefix for matching
+CREATE TABLE IF NOT EXISTS options (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    machine_id INTEGER NOT NULL REFERENCES machines (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions (id),
+    option_id INTEGER REFERENCES options (id),
+    value TEXT,
+    PRIMARY KEY (machine_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS settings_by_question ON settings (question_id, option_id);
+CREATE INDEX IF NOT EXISTS questions_by_text ON questions (question COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS questions_by_token ON questions (token COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS options_by_name ON options (name);
+"""
+
+# (question, token, offset, active option label, value) of each setting of a dump
+Row = Tuple[str, str, str, Optional[str], Optional[str]]
+
+
+def option_name(label: str) -> str:
+    return RE_BRACKET_PREFIX.sub('', label).strip().lower()
+
+
+def read_dump(path: str, encoding: str = nvram_parser.DEFAULT_ENCODING,
+              known_digest: Optional[str] = None) -> Tuple[str, Optional[List[Row]]]:
+    """
+    hashes and parses a dump into plain rows for ingesting, rows are None if the hash is `known_digest`.
+    everything returned is picklable so it can run in a worker process
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    if digest == known_digest:
+        return digest, None
+    rows = []
+    for setting in nvram_parser.parse_text(data.decode(encoding)):
+        label = None
+        if setting.active_option is not None and setting.active_option < len(setting.option_ids):
+            label = setting.options[setting.active_option]
+        rows.append((setting.setup_question.strip(), setting.token, setting.offset, label, setting.value))
+    return digest, rows
+
+
+class FleetStore:
+    """
+    settings of many dumps, one machine per dump. questions and option labels are stored once and
+    referenced by id, so a thousand copies of the same board cost little more than their active choices.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.db.close()
+            raise ValueError(f"{path} has fleet schema version {version}, expected {SCHEMA_VERSION}")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # ids of the questions and labels already in the database, so ingesting mostly skips the lookups
+        self._question_ids: Dict[Tuple[str, str, str], int] = {}
+        self._option_ids: Dict[str, int] = {}
+        self._pending_rows = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self) -> 'FleetStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_ids(self):
+        if not self._question_ids:
+            self._question_ids = {(question, token, offset): qid for qid, question, token, offset
+                                  in self.db.execute("SELECT id, question, token, offset FROM questions")}
+        if not self._option_ids:
+            self._option_ids = {label: oid for oid, label in self.db.execute("SELECT id, label FROM options")}
+
+    def digests(self) -> Dict[str, str]:
+        """content hash of every stored machine's dump by name"""
+        return dict(self.db.execute("SELECT name, digest FROM machines"))
+
+    def add_machine(self, name: str, path: str, digest: str, rows: List[Row]):
+        """
+        stores the settings of one machine, replacing what was stored under `name` before.
+        changes are committed every BATCH_ROWS settings, call `commit` when done
+        """
+        self._load_ids()
+        db = self.db
+        db.execute("DELETE FROM machines WHERE name = ?", (name,))
+        machine_id = db.execute("INSERT INTO machines (name, path, digest, settings) VALUES (?, ?, ?, ?)",
+                                (name, path, digest, len(rows))).lastrowid
+        question_ids, option_ids = self._question_ids, self._option_ids
+        records = []
+        for position, (question, token, offset, label, value) in enumerate(rows):
+            key = (question, token, offset)
+            qid = question_ids.get(key)
+            if qid is None:
+                qid = question_ids[key] = db.execute(
+                    "INSERT INTO questions (question, token, offset) VALUES (?, ?, ?)", key).lastrowid
+            oid = None
+            if label is not None:
+                oid = option_ids.get(label)
+                if oid is None:
+                    oid = option_ids[label] = db.execute(
+                        "INSERT INTO options (label, name) VALUES (?, ?)", (label, option_name(label))).lastrowid
+            records.append((machine_id, position, qid, oid, value))
+        db.executemany("INSERT INTO settings (machine_id, position, question_id, option_id, value) "
+                       "VALUES (?, ?, ?, ?, ?)", records)
+        self._pending_rows += len(records)
+        if self._pending_rows >= BATCH_ROWS:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self._pending_rows = 0
+
+    def machine_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+
+    @staticmethod
+    def _question_filter(question: Optional[str], token: Optional[str]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if question is not None:
+            clauses.append("q.question = ? COLLATE NOCASE")
+            params.append(question.strip())
+        if token is not None:
+            clauses.append("q.token = ? COLLATE NOCASE")
+            params.append(token.strip())
+        if not clauses:
+            raise ValueError("a question or a token is required")
+        return " AND ".join(clauses), params
+
+    def machines_with(self, option: str, question: Optional[str] = None,
+                      token: Optional[str] = None) -> List[Tuple[str, str, str, str, str]]:
+        """
+        (machine, question, token, offset, active label) of the machines where the selected setting is set to `option`,
+        matched like presets: the full label or the label without its [xx] prefix, ignoring case
+        """
+        where, params = self._question_filter(question, token)
+        return self.db.execute(
+            "SELECT m.name, q.question, q.token, q.offset, o.label FROM questions q "
+            "JOIN settings s ON s.question_id = q.id "
+            "JOIN options o ON o.id = s.option_id "
+            "JOIN machines m ON m.id = s.machine_id "
+            f"WHERE {where} AND o.id IN (SELECT id FROM options WHERE name = ? OR label = ? COLLATE NOCASE) "
+            "ORDER BY m.name", params + [option_name(option), option.strip()]).fetchall()
+
+    def distribution(self, question: Optional[str] = None,
+                     token: Optional[str] = None) -> List[Tuple[str, str, str, str, int]]:
+        """
+        (question, token, offset, active label or value, machine count) of the selected settings,
+        most common choice first
+        """
+        where, params = self._question_filter(question, token)
+        return self.db.execute(
+            "SELECT q.question, q.token, q.offset, COALESCE(o.label, s.value, '') AS choice, "
+            "COUNT(DISTINCT s.machine_id) AS machines "
+            "FROM questions q JOIN settings s ON s.question_id = q.id "
+            "LEFT JOIN options o ON o.id = s.option_id "
+            f"WHERE {where} GROUP BY q.id, choice ORDER BY q.id, machines DESC, choice",
+            params).fetchall()
+
+
+def machine_name(path: str, name_from: str = 'file') -> str:
+    """names a machine after its dump's file name, or its directory for exports that are all called nvram.txt"""
+    path = os.path.abspath(path)
+    if name_from == 'dir':
+        return os.path.basename(os.path.dirname(path))
+    if name_from == 'path':
+        return path
+    return os.path.splitext(os.path.basename(path))[0]
+
@@ -0,0 +1,227 @@
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from models import BIOSSetting
+from search_index import RE_WORD
+
+# a word found in the question counts this much more than one in the help text
+QUESTION_WEIGHT = 2.0
+HELP_WEIGHT = 1.0
+# settings that also contain the query as plain text rank above fuzzy-only matches
+EXACT_BONUS = 1.0
+# work done between two checks for a newer query
+BATCH = 2000
+
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """levenshtein distance with adjacent swaps, gives up with limit + 1 once it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        best = i
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            best = min(best, value)
+        if best > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def word_score(term: str, word: str) -> float:
+    """
+    how well a query word matches a word of a setting, 0 for no match:
+    1 for the same word, 0.7-0.9 for a prefix, 0.5 for a substring and 0.3-0.6 for a word within one
+    or two typos (or one starting with such a prefix)
+    """
+    if word == term:
+        return 1.0
+    if word.startswith(term):
+        return 0.7 + 0.2 * len(term) / len(word)
+    if len(term) < 3:
+        return 0.0
+    if term in word:
+        return 0.5
+    limit = 1 if len(term) < 8 else 2
+    distance = _distance(term, word, limit)
+    if distance <= limit:
+        return 0.6 - 0.1 * distance
+    if len(word) > len(term):
+        distance = _distance(term, word[:len(term)], limit)
+        if distance <= limit:
+            return 0.5 - 0.1 * distance
+    return 0.0
+
+
+class FuzzyIndex:
+    """
+    word index over the questions and help strings of a dump for typo tolerant, ranked search.
+    adjacent words are also indexed joined, so "cstate" finds "C-State".
+    a query word is scored against the vocabulary once, then the scores are spread to the settings
+    through the postings. every query word has to match somewhere, settings rank by the sum of their
+    best word scores weighted by field.
+    """
+
+    def __init__(self, settings: Sequence[BIOSSetting] = (), is_stale: Callable[[], bool] = lambda: False):
+        # word -> (setting ids with it in the question, setting ids with it in the help text)
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._term_cache: Dict[str, List[Tuple[str, float]]] = {}
+        self.complete = self._build(settings, is_stale)
+
+    def _build(self, settings: Sequence[BIOSSetting], is_stale: Callable[[], bool]) -> bool:
+        postings = self.postings
+        for position, setting in enumerate(settings):
+            if position % BATCH == 0 and is_stale():
+                return False
+            for slot, text in ((0, setting.setup_question), (1, setting.help_string)):
+                words = RE_WORD.findall(text.lower())
+                joined = [a + b for a, b in zip(words, words[1:])]
+                for word in set(words).union(joined):
+                    entry = postings.get(word)
+                    if entry is None:
+                        entry = postings[word] = ([], [])
+                    entry[slot].append(setting.sid)
+        return True
+
+    def _term_matches(self, term: str, is_stale: Callable[[], bool]) -> Optional[List[Tuple[str, float]]]:
+        matches = self._term_cache.get(term)
+        if matches is None:
+            matches = []
+            for count, word in enumerate(self.postings):
+                if count % BATCH == 0 and is_stale():
+                    return None
+                score = word_score(term, word)
+                if score > 0:
+                    matches.append((word, score))
+            self._term_cache[term] = matches
+        return matches
+
+    def search(self, text: str, is_stale: Callable[[], bool] = lambda: False,
+               allowed: Optional[Set[int]] = None, exact: Optional[Set[int]] = None) -> Optional[List[int]]:
+        """
+        setting ids matching every word of `text`, best first, or None if the query went stale.
+        `allowed` restricts the result, settings in `exact` get EXACT_BONUS and are kept even without
+        a fuzzy match
+        """
+        terms = list(dict.fromkeys(RE_WORD.findall(text.lower())))
+        scores: Optional[Dict[int, float]] = None
+        for term in terms:
+            matches = self._term_matches(term, is_stale)
+            if matches is None:
+                return None
+            best: Dict[int, float] = {}
+            work = 0
+            for word, score in matches:
+                question_docs, help_docs = self.postings[word]
+                for docs, weight in ((question_docs, QUESTION_WEIGHT), (help_docs, HELP_WEIGHT)):
+                    weighted = score * weight
+                    for doc in docs:
+                        if best.get(doc, 0.0) < weighted:
+                            best[doc] = weighted
+                    work += len(docs)
+                if work >= BATCH:
+                    if is_stale():
+                        return None
+                    work = 0
+            if scores is None:
+                scores = best
+            else:
+                scores = {doc: total + best[doc] for doc, total in scores.items() if doc in best}
+            if not scores:
+                break
+        scores = scores or {}
+        for doc in exact or ():
+            scores[doc] = scores.get(doc, 0.0) + EXACT_BONUS
+        if allowed is not None:
+            scores = {doc: score for doc, score in scores.items() if doc in allowed}
+        if is_stale():
+            return None
+        return sorted(scores, key=lambda doc: (-scores[doc], doc))
+
+
+class FuzzySearchWorker:
+    """
+    runs fuzzy searches on a worker thread. only the newest query matters: submitting one makes any
+    running or queued query stale, stale queries stop at their next batch boundary.
+    results are put on `results` as (generation, ranked ids) for the Tk thread to poll with root.after,
+    results whose generation is not the current one are stale and should be dropped.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.results: queue.Queue = queue.Queue()
+        self._settings: Sequence[BIOSSetting] = ()
+        self._index: Optional[FuzzyIndex] = None
+        self._pending: Optional[tuple] = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def reset(self, settings: Sequence[BIOSSetting]):
+        """
+        searches `settings` from now on, the index is rebuilt on the worker thread by the next query
+        """
+        with self._condition:
+            self.generation += 1
+            self._settings = settings
+            self._index = None
+            self._pending = None
+
+    def submit(self, text: str, allowed: Optional[Set[int]] = None, exact: Optional[Set[int]] = None) -> int:
+        with self._condition:
+            self.generation += 1
+            self._pending = (self.generation, text, allowed, exact)
+            self._condition.notify()
+            return self.generation
+
+    def cancel(self):
+        with self._condition:
+            self.generation += 1
+            self._pending = None
+
+    def close(self):
+        """stops the worker thread once its current query is abandoned"""
+        with self._condition:
+            self.generation += 1
+            self._closed = True
+            self._settings = ()
+            self._index = None
+            self._pending = None
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                generation, text, allowed, exact = self._pending
+                self._pending = None
+                settings, index = self._settings, self._index
+
+            def is_stale() -> bool:
+                return self.generation != generation
+            try:
+                if index is None:
+                    # the index outlives the query that started it, only a reset abandons it
+                    index = FuzzyIndex(settings, lambda: self._settings is not settings)
+                    if not index.complete:
+                        continue
+                    with self._condition:
+                        if self._settings is settings:
+                            self._index = index
+                ranked = index.search(text, is_stale, allowed, exact)
+            except Exception as e:
+                print(f"Error in fuzzy search: {e}")
+                continue
+            if ranked is not None:
+                self.results.put((generation, ranked))
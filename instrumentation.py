@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class Span:
+    """
+    one timed operation with counters such as lines, settings or rows.
+    use as a context manager, or call finish() for operations spread over several Tk callbacks
+    """
+    __slots__ = ('tracer', 'name', 'start', 'duration', 'counts', 'thread')
+
+    def __init__(self, tracer: 'Tracer', name: str, counts: Dict[str, int]):
+        self.tracer = tracer
+        self.name = name
+        self.counts = counts
+        self.duration: Optional[float] = None
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+
+    def count(self, **counts: int):
+        self.counts.update(counts)
+
+    def finish(self, **counts: int) -> 'Span':
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.start
+            self.counts.update(counts)
+            self.tracer._record(self)
+        return self
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def describe(self) -> str:
+        """e.g. "filter 12.3 ms (rows=10000, matches=52)" """
+        text = f"{self.name} {self.duration * 1000:.1f} ms" if self.duration is not None else f"{self.name} running"
+        if self.counts:
+            text += " (" + ", ".join(f"{key}={value}" for key, value in self.counts.items()) + ")"
+        return text
+
+
+class Tracer:
+    """
+    collects spans from any thread. the last span of each name is always kept so the GUI can show it,
+    every finished span is only kept while recording a trace
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.last: Dict[str, Span] = {}
+        self.events: Optional[List[Span]] = None
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **counts: int) -> Span:
+        return Span(self, name, counts)
+
+    def record_events(self):
+        self.events = []
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.last[span.name] = span
+            if self.events is not None:
+                self.events.append(span)
+
+    def write_trace(self, path: str):
+        """
+        writes the recorded spans in the Chrome trace event format, open it in chrome://tracing or ui.perfetto.dev
+        """
+        with self._lock:
+            spans = list(self.events or ())
+        pid = os.getpid()
+        events = [{
+            'name': span.name,
+            'ph': 'X',
+            'ts': round((span.start - self.origin) * 1e6),
+            'dur': round(span.duration * 1e6),
+            'pid': pid,
+            'tid': span.thread,
+            'args': span.counts,
+        } for span in spans]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+TRACER = Tracer()
+
+
+def span(name: str, **counts: int) -> Span:
+    """starts a span on the shared tracer"""
+    return TRACER.span(name, **counts)
@@ -1,5 +1,5 @@
-from bios_settings_manager import BIOSSettingsManager
+import sys
+from cli import main
 
 if __name__ == "__main__":
-    app = BIOSSettingsManager()
-    app.run()
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import mmap
+import os
+import re
+from array import array
+from typing import Iterator, Optional, Union
+from models import NO_OFFSET, BIOSSetting, intern
+import nvram_parser
+
+# one pass over the whole buffer picks up the keyword lines the list needs and any line marked active with *
+RE_SCAN = re.compile(rb'^[ \t]*(?:(Setup[ \t]+Question|Token|Offset|Value|Options)[ \t]*=|(?=\*))([^\r\n]*)',
+                     re.MULTILINE | re.IGNORECASE)
+SETUP, TOKEN, OFFSET, VALUE, OPTIONS = range(5)
+SCAN_KEYS = {b'se': SETUP, b'to': TOKEN, b'of': OFFSET, b'va': VALUE, b'op': OPTIONS}
+
+
+class MappedText:
+    """
+    read-only, memory-mapped view of a dump that slices like the str it replaces.
+    offsets are byte offsets and slices are decoded on access, so nothing is held in memory up front.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], encoding: str = nvram_parser.DEFAULT_ENCODING):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, 'rb')
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __getitem__(self, key: slice) -> str:
+        return self.buffer[key].decode(self.encoding)
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+
+def _finish_scan(setting: BIOSSetting, start: int, end: int, active: Optional[str], options_line: Optional[str]):
+    if active is not None:
+        setting.preview = active
+    elif setting.value is not None:
+        setting.preview = setting.value
+    else:
+        setting.preview = options_line or ""
+    setting.spans = array('I', (start, end, NO_OFFSET, NO_OFFSET, NO_OFFSET, NO_OFFSET))
+
+
+def scan(source: MappedText) -> Iterator[BIOSSetting]:
+    """
+    quick first pass over a mapped dump: finds the record boundaries and decodes only the
+    question, token, offset and value of each setting plus the text shown in the list.
+    help strings, width, default, leftover content and option lists are decoded later by materialize().
+    """
+    encoding = source.encoding
+    strip_comment = nvram_parser.strip_comment
+    current = None
+    start = 0
+    active = options_line = None
+    for match in RE_SCAN.finditer(source.buffer):
+        key, rest = match.groups()
+        # the keyword is known to be one of RE_SCAN's, so its first two letters are enough to tell them apart
+        kind = SCAN_KEYS[key[:2].lower()] if key else None
+        if kind == SETUP:
+            if current is not None:
+                _finish_scan(current, start, match.start(), active, options_line)
+                yield current
+            current = BIOSSetting(setup_question=intern(strip_comment(rest.decode(encoding))))
+            start = match.start()
+            active = options_line = None
+            continue
+        if current is None:
+            continue
+        text = strip_comment(rest.decode(encoding))
+        if kind is None or (kind == OPTIONS and text.startswith('*')):
+            if active is None and text.lstrip('*').startswith('['):
+                active = text.lstrip('*')
+        elif kind == OPTIONS:
+            options_line = options_line or text
+        elif kind == VALUE:
+            current.value = intern(text)
+        elif kind == TOKEN:
+            current.token = intern(text)
+        elif kind == OFFSET:
+            current.offset = intern(text)
+    if current is not None:
+        _finish_scan(current, start, len(source.buffer), active, options_line)
+        yield current
+
+
+def materialize(setting: BIOSSetting, source: MappedText) -> BIOSSetting:
+    """
+    fully parses a lazily loaded setting from its record in the mapped file, a no-op once loaded
+    """
+    if setting.preview is None:
+        return setting
+    start, end = setting.span
+    text = source[start:end]
+    full: Optional[BIOSSetting] = next(nvram_parser.parse_text(text), None)
+    if full is not None:
+        for field in ('help_string', 'token', 'offset', 'width', 'bios_default',
+                      'option_ids', 'active_option', 'value', 'content'):
+            setattr(setting, field, getattr(full, field))
+        # the record was parsed on its own as text, turn its character offsets into file byte offsets
+        single_byte = len(text) == end - start
+        spans = array('I', full.spans)
+        for i, offset in enumerate(spans):
+            if offset != NO_OFFSET:
+                spans[i] = start + (offset if single_byte else len(text[:offset].encode(source.encoding)))
+        setting.spans = spans
+    setting.preview = None
+    return setting
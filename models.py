@@ -1,7 +1,78 @@
+import re
+import sys
+from array import array
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-@dataclass
+
+RE_BRACKET_PREFIX = re.compile(r'^\[[^\]]*\]')
+
+
+class LabelTable:
+    """
+    shared table of option labels, every distinct label such as "[01]Enabled" is stored once
+    and settings keep their options as indexes into it. every distinct option list is also kept once,
+    so all settings offering Disabled/Enabled, in any open dump, share one tuple
+    """
+
+    def __init__(self):
+        self._labels: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._lists: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        self._index_maps: Dict[Tuple[int, ...], Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def id_of(self, label: str) -> int:
+        label_id = self._ids.get(label)
+        if label_id is None:
+            label_id = len(self._labels)
+            self._labels.append(label)
+            self._ids[label] = label_id
+        return label_id
+
+    def ids_of(self, labels: Iterable[str]) -> Tuple[int, ...]:
+        return self.canonical(tuple(self.id_of(label) for label in labels))
+
+    def canonical(self, ids: Tuple[int, ...]) -> Tuple[int, ...]:
+        """the shared tuple equal to `ids`"""
+        return self._lists.setdefault(ids, ids)
+
+    def labels_of(self, ids: Tuple[int, ...]) -> Tuple[str, ...]:
+        labels = self._labels
+        return tuple(labels[i] for i in ids)
+
+    def index_map(self, ids: Tuple[int, ...]) -> Dict[str, int]:
+        """
+        maps the lowercased labels of an option list to their index, both as "[01]enabled" and "enabled".
+        built once per distinct list, most settings share a handful of lists like Disabled/Enabled
+        """
+        index_map = self._index_maps.get(ids)
+        if index_map is None:
+            index_map = {}
+            labels = self.labels_of(ids)
+            for index, label in enumerate(labels):
+                index_map.setdefault(label.strip().lower(), index)
+            for index, label in enumerate(labels):
+                index_map.setdefault(RE_BRACKET_PREFIX.sub('', label.strip()).strip().lower(), index)
+            self._index_maps[ids] = index_map
+        return index_map
+
+
+OPTION_LABELS = LabelTable()
+
+# marks a missing span in BIOSSetting.spans
+NO_OFFSET = 0xFFFFFFFF
+EMPTY_SPANS = (NO_OFFSET,) * 6
+
+
+def intern(text: Optional[str]) -> Optional[str]:
+    """interns repeated field values such as widths, defaults and help strings so equal values share one object"""
+    return sys.intern(text) if text else text
+
+
+@dataclass(slots=True)
 class BIOSSetting:
     setup_question: str = ""
     help_string: str = ""
@@ -9,12 +80,68 @@ class BIOSSetting:
     offset: str = ""
     width: str = ""
     bios_default: Optional[str] = None
-    options: List[str] = None
+    # options as indexes into OPTION_LABELS, use the options property to get the labels
+    option_ids: Tuple[int, ...] = ()
     active_option: Optional[int] = None
     value: Optional[str] = None
-    content: List[str] = None
+    content: Tuple[str, ...] = ()
+    # stable id assigned by the SettingsStore that owns this setting
+    sid: int = -1
+    # set when the setting was edited and has to be rewritten on save
+    dirty: bool = False
+    # list text of a lazily loaded setting whose help, content and options are not decoded yet, None once loaded
+    preview: Optional[str] = None
+    # character offsets into the loaded text of the whole record, its Options block and its Value line,
+    # packed as (start, end) pairs in one array instead of three tuples, use the span properties
+    spans: Optional[array] = None
+
+    def _get_span(self, slot: int) -> Optional[Tuple[int, int]]:
+        if self.spans is None or self.spans[slot] == NO_OFFSET:
+            return None
+        return (self.spans[slot], self.spans[slot + 1])
+
+    def _set_span(self, slot: int, span: Optional[Tuple[int, int]]):
+        if self.spans is None:
+            self.spans = array('I', EMPTY_SPANS)
+        self.spans[slot], self.spans[slot + 1] = span if span is not None else (NO_OFFSET, NO_OFFSET)
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        return self._get_span(0)
+
+    @span.setter
+    def span(self, span: Optional[Tuple[int, int]]):
+        self._set_span(0, span)
+
+    @property
+    def options_span(self) -> Optional[Tuple[int, int]]:
+        return self._get_span(2)
+
+    @options_span.setter
+    def options_span(self, span: Optional[Tuple[int, int]]):
+        self._set_span(2, span)
+
+    @property
+    def value_span(self) -> Optional[Tuple[int, int]]:
+        return self._get_span(4)
+
+    @value_span.setter
+    def value_span(self, span: Optional[Tuple[int, int]]):
+        self._set_span(4, span)
+
+    @property
+    def options(self) -> Tuple[str, ...]:
+        return OPTION_LABELS.labels_of(self.option_ids)
+
+    @options.setter
+    def options(self, labels: Iterable[str]):
+        self.option_ids = OPTION_LABELS.ids_of(labels)
+
+    def option_index(self, label: str) -> Optional[int]:
+        """index of the option matching `label`, either the full "[01]Enabled" form or just "Enabled", ignoring case"""
+        return OPTION_LABELS.index_map(self.option_ids).get(label.strip().lower())
 
     @property
-    def unique_id(self) -> str:
-        """Create a unique identifier for this setting"""
-        return f"{self.setup_question}||{self.token}||{self.offset}"
+    def key(self) -> Tuple[str, str, str]:
+        """The (question, token, offset) triple identifying this setting in a dump, not always unique"""
+        return (self.setup_question.strip(), self.token.strip(), self.offset.strip())
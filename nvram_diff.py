@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from models import BIOSSetting
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+
+@dataclass
+class DiffEntry:
+    """
+    one difference between two dumps, `old` is None for added settings and `new` for removed ones
+    """
+    kind: str
+    key: Tuple[str, str, str]
+    old: Optional[BIOSSetting] = None
+    new: Optional[BIOSSetting] = None
+    old_value: str = ""
+    new_value: str = ""
+    # set when a setting kept its active option but its list of options changed, e.g. after a BIOS update
+    options_changed: bool = False
+
+
+def value_of(setting: BIOSSetting) -> str:
+    """
+    the active option label or the value of a setting, what a diff compares
+    """
+    if setting.preview is not None:
+        return setting.preview
+    options = setting.options
+    if options:
+        if setting.active_option is not None and 0 <= setting.active_option < len(options):
+            return options[setting.active_option]
+        return ""
+    return setting.value if setting.value is not None else ""
+
+
+def diff_settings(old: Iterable[BIOSSetting], new: Iterable[BIOSSetting],
+                  resolve: Optional[Callable[[BIOSSetting], BIOSSetting]] = None) -> List[DiffEntry]:
+    """
+    hash join of two dumps on the (question, token, offset) key, in one pass over each side.
+    settings sharing a key are paired in file order. `resolve` is called on lazily loaded settings
+    before they are reported, so only the few that differ by their preview have to be decoded.
+    changed and added settings come in the order of `new`, removed ones after them.
+    """
+    by_key: Dict[Tuple[str, str, str], List[BIOSSetting]] = {}
+    for setting in old:
+        by_key.setdefault(setting.key, []).append(setting)
+    taken: Dict[Tuple[str, str, str], int] = {}
+
+    entries = []
+    for setting in new:
+        key = setting.key
+        candidates = by_key.get(key)
+        nth = taken.get(key, 0)
+        if candidates is None or nth >= len(candidates):
+            entries.append(DiffEntry(ADDED, key, new=setting, new_value=value_of(setting)))
+            continue
+        taken[key] = nth + 1
+        before = candidates[nth]
+        lazy = before.preview is not None or setting.preview is not None
+        if (not lazy and before.option_ids == setting.option_ids and before.active_option == setting.active_option
+                and before.value == setting.value):
+            # the common case, label ids are shared so this is a few int compares without building any labels
+            continue
+        old_value = value_of(before)
+        new_value = value_of(setting)
+        if lazy and resolve is not None and old_value != new_value:
+            # previews of settings without an active option differ from the decoded form, compare them decoded
+            before, setting = resolve(before), resolve(setting)
+            old_value, new_value = value_of(before), value_of(setting)
+        options_changed = not lazy and before.option_ids != setting.option_ids
+        if old_value != new_value or options_changed:
+            entries.append(DiffEntry(CHANGED, key, before, setting, old_value, new_value, options_changed))
+
+    for key, candidates in by_key.items():
+        for before in candidates[taken.get(key, 0):]:
+            entries.append(DiffEntry(REMOVED, key, old=before, old_value=value_of(before)))
+    return entries
@@ -0,0 +1,189 @@
+import io
+import os
+import re
+import sys
+from array import array
+from typing import IO, Iterable, Iterator, List, Optional, Union
+from models import NO_OFFSET, BIOSSetting, intern
+
+# SCEWIN exports use the ANSI code page of the machine that produced them,
+# "ansi" is only a valid codec on windows so fall back to its usual value
+DEFAULT_ENCODING = 'ansi' if sys.platform == 'win32' else 'cp1252'
+
+# bump whenever parsing results change, cached parses from older versions are then ignored
+PARSER_VERSION = 1
+
+# kinds of "Key = value" lines, the key is matched lowercased with single spaces
+SETUP_QUESTION, HELP_STRING, TOKEN, OFFSET, WIDTH, BIOS_DEFAULT, OPTIONS, VALUE = range(8)
+KEYWORDS = {
+    'setup question': SETUP_QUESTION,
+    'help string': HELP_STRING,
+    'token': TOKEN,
+    'offset': OFFSET,
+    'width': WIDTH,
+    'bios default': BIOS_DEFAULT,
+    'options': OPTIONS,
+    'value': VALUE,
+}
+
+RE_OPTION = re.compile(r'(\*?)\[([^\]]+)\](\S.*?|)$')
+
+
+def strip_comment(raw_line: str) -> str:
+    """
+    removes a trailing // comment and surrounding whitespace from a line
+    """
+    cut = raw_line.find('//')
+    if cut >= 0:
+        raw_line = raw_line[:cut]
+    return raw_line.strip()
+
+
+def line_kind(line: str) -> Optional[int]:
+    """
+    returns the keyword kind of a comment-stripped line, or None if it is not a "Key = value" line
+    """
+    eq = line.find('=')
+    if eq <= 0:
+        return None
+    key = line[:eq].rstrip().lower()
+    kind = KEYWORDS.get(key)
+    if kind is None and (' ' in key or '\t' in key):
+        kind = KEYWORDS.get(' '.join(key.split()))
+    return kind
+
+
+def is_option_line(line: str) -> bool:
+    """
+    true for bracketed option lines such as "*[01]Enabled"
+    """
+    line = line.lstrip('*')
+    return line.startswith('[') and ']' in line
+
+
+def parse_options_line(line: str, options: List[str]) -> Optional[int]:
+    """
+    appends the options found on a single line to `options`,
+    returns the index of the one marked active with a leading *, if any
+    """
+    active = None
+    found = RE_OPTION.findall(line)
+    if not found:
+        star_in_front = line.strip().startswith('*')
+        clean_line = line.lstrip('*').strip()
+        if clean_line:
+            if star_in_front:
+                active = len(options)
+            options.append(clean_line)
+        return active
+    for star, bracket_num, remainder in found:
+        if star == '*':
+            active = len(options)
+        options.append(f"[{bracket_num}]{remainder}".strip())
+    return active
+
+
+def _finalize(setting: BIOSSetting, options: List[str], content: List[str], spans: List[int]) -> BIOSSetting:
+    # a single option without an active marker is really a value
+    if len(options) == 1 and setting.active_option is None:
+        setting.value = intern(options[0])
+    elif options:
+        setting.options = options
+    if content:
+        setting.content = tuple(content)
+    setting.spans = array('I', spans)
+    return setting
+
+
+def parse_lines(lines: Iterable[str]) -> Iterator[BIOSSetting]:
+    """
+    parses the lines of an NVRAM dump and yields one BIOSSetting per "Setup Question" block.
+    every line is dispatched once on its leading keyword instead of being run through a regex per field.
+    spans are recorded as character offsets into the concatenated lines, so pass lines with their line endings.
+    """
+    current = None
+    options: List[str] = []
+    content: List[str] = []
+    # record, Options block and Value line offsets of the current setting, laid out like BIOSSetting.spans
+    spans: List[int] = []
+    pos = 0
+    for raw_line in lines:
+        start = pos
+        pos += len(raw_line)
+        line = strip_comment(raw_line)
+        if not line:
+            continue
+        kind = line_kind(line)
+        if kind == SETUP_QUESTION:
+            if current is not None:
+                spans[1] = start
+                yield _finalize(current, options, content, spans)
+            current = BIOSSetting(setup_question=intern(line[line.find('=') + 1:].strip()))
+            options = []
+            content = []
+            spans = [start, start, NO_OFFSET, NO_OFFSET, NO_OFFSET, NO_OFFSET]
+            continue
+        if current is None:
+            continue
+        if kind is None:
+            if is_option_line(line):
+                active = parse_options_line(line, options)
+                if active is not None:
+                    current.active_option = active
+                # option lines directly below the Options line belong to its block
+                if spans[3] == start:
+                    spans[3] = pos
+            else:
+                content.append(intern(line))
+            continue
+        rest = intern(line[line.find('=') + 1:].strip())
+        if kind == OPTIONS:
+            active = parse_options_line(rest, options)
+            if active is not None:
+                current.active_option = active
+            if spans[2] == NO_OFFSET:
+                spans[2] = start
+                spans[3] = pos
+        elif kind == VALUE:
+            current.value = rest
+            spans[4] = start
+            spans[5] = pos
+        elif kind == TOKEN:
+            current.token = rest
+        elif kind == OFFSET:
+            current.offset = rest
+        elif kind == WIDTH:
+            current.width = rest
+        elif kind == BIOS_DEFAULT:
+            current.bios_default = rest
+        elif kind == HELP_STRING:
+            current.help_string = rest
+    if current is not None:
+        spans[1] = pos
+        yield _finalize(current, options, content, spans)
+
+
+def parse_text(text: str) -> Iterator[BIOSSetting]:
+    """
+    parses a whole dump held in memory, spans are offsets into `text`
+    """
+    return parse_lines(io.StringIO(text, newline=''))
+
+
+def read_text(path: Union[str, os.PathLike], encoding: str = DEFAULT_ENCODING) -> str:
+    """
+    reads a dump without translating line endings, so spans and saved output match the file byte for byte
+    """
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        return f.read()
+
+
+def parse(path_or_stream: Union[str, os.PathLike, IO[str]], encoding: str = DEFAULT_ENCODING) -> Iterator[BIOSSetting]:
+    """
+    parses an NVRAM dump given either a file path or an open text stream and yields its settings
+    """
+    if hasattr(path_or_stream, 'read'):
+        yield from parse_lines(path_or_stream)
+        return
+    with open(path_or_stream, 'r', encoding=encoding, newline='') as f:
+        yield from parse_lines(f)
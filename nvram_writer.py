@@ -0,0 +1,156 @@
+import os
+import re
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+from mapped_dump import MappedText
+from models import BIOSSetting
+from nvram_parser import DEFAULT_ENCODING
+
+# bytes handed to the file per write, untouched regions are copied in pieces of this size too
+CHUNK_SIZE = 1 << 20
+
+RE_OPTIONS_HEAD = re.compile(r'^(\s*Options\s*=\s*)', re.IGNORECASE)
+RE_VALUE_LINE = re.compile(r'^(\s*(?:Value|Options)\s*=\s*)(.*?)(\s*//.*?)?(\r\n|\r|\n)?$', re.IGNORECASE | re.DOTALL)
+RE_NEWLINE = re.compile(r'(\r\n|\r|\n)$')
+
+
+def _newline_of(line: str) -> str:
+    match = RE_NEWLINE.search(line)
+    return match.group(1) if match else ''
+
+
+def render_options(block: str, setting: BIOSSetting) -> str:
+    """
+    rewrites an Options block so only the active option carries the * marker.
+    lines keep their original spacing and comments, if the block does not have one line per option
+    it is rebuilt in the usual SCEWIN layout instead.
+    """
+    lines = block.splitlines(keepends=True)
+    if len(lines) == len(setting.options):
+        out = []
+        for idx, line in enumerate(lines):
+            head = RE_OPTIONS_HEAD.match(line) if idx == 0 else None
+            cut = head.end() if head else len(line) - len(line.lstrip())
+            body = line[cut:].lstrip('*')
+            out.append(f"{line[:cut]}{'*' if setting.active_option == idx else ''}{body}")
+        return ''.join(out)
+    newline = _newline_of(lines[0]) if lines else '\n'
+    comment_at = lines[0].find('//') if lines else -1
+    comment = f"\t{lines[0][comment_at:].rstrip()}" if comment_at >= 0 else ""
+    out = []
+    for idx, opt in enumerate(setting.options):
+        prefix = "Options\t=" if idx == 0 else "         "
+        active = '*' if setting.active_option == idx else ''
+        out.append(f"{prefix}{active}{opt}{comment if idx == 0 else ''}{newline}")
+    return ''.join(out)
+
+
+def render_value(line: str, setting: BIOSSetting) -> str:
+    """
+    rewrites a Value line with the setting's value, keeping its indentation, comment and line ending.
+    settings whose value came from a lone unmarked option have that Options line rewritten instead.
+    """
+    match = RE_VALUE_LINE.match(line)
+    if not match:
+        return line
+    head, _, comment, newline = match.groups()
+    return f"{head}{setting.value}{comment or ''}{newline or ''}"
+
+
+def replacements(text: str, settings: Iterable[BIOSSetting]) -> List[Tuple[int, int, str]]:
+    """
+    collects (start, end, new_text) substitutions for the dirty settings, ordered by position
+    """
+    subs = []
+    for setting in settings:
+        if not setting.dirty:
+            continue
+        if setting.options and setting.options_span is not None:
+            start, end = setting.options_span
+            subs.append((start, end, render_options(text[start:end], setting)))
+        elif setting.value is not None and (setting.value_span or setting.options_span) is not None:
+            start, end = setting.value_span or setting.options_span
+            subs.append((start, end, render_value(text[start:end], setting)))
+    subs.sort()
+    return subs
+
+
+def iter_output(text: str, settings: Iterable[BIOSSetting]) -> Iterator[str]:
+    """
+    yields the saved file piece by piece: untouched regions are sliced straight out of the
+    original text and only the spans of dirty settings are replaced, nothing is re-parsed
+    """
+    pos = 0
+    for start, end, new_text in replacements(text, settings):
+        yield text[pos:start]
+        yield new_text
+        pos = end
+    yield text[pos:]
+
+
+def iter_chunks(text, settings: Iterable[BIOSSetting], encoding: str = DEFAULT_ENCODING,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    yields the saved file encoded, in chunks of about `chunk_size` bytes, so memory stays flat however big the dump.
+    untouched regions of a MappedText are copied straight from the mapping without decoding them
+    """
+    raw = text.buffer if isinstance(text, MappedText) else None
+    pending: List[bytes] = []
+    size = 0
+    pos = 0
+    for start, end, new_text in replacements(text, settings) + [(len(text), len(text), '')]:
+        # the untouched region before the replacement, in bounded slices
+        for cut in range(pos, start, chunk_size):
+            piece = raw[cut:min(cut + chunk_size, start)] if raw is not None else \
+                text[cut:min(cut + chunk_size, start)].encode(encoding)
+            pending.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield b''.join(pending)
+                pending, size = [], 0
+        if new_text:
+            piece = new_text.encode(encoding)
+            pending.append(piece)
+            size += len(piece)
+        pos = end
+    if pending:
+        yield b''.join(pending)
+
+
+def write(path: Union[str, os.PathLike], text, settings: Iterable[BIOSSetting],
+          encoding: str = DEFAULT_ENCODING, before_replace: Optional[Callable[[], None]] = None) -> int:
+    """
+    streams the saved file into a temporary file next to `path` and renames it over `path` once it is
+    complete and flushed to disk, so a crash or a full disk never leaves a truncated dump behind.
+    `before_replace` runs right before the rename, e.g. to close a mapping of `path` that would block it on windows.
+    returns the number of bytes written
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter_chunks(text, settings, encoding):
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            # mkstemp creates the file readable by its owner only
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        if before_replace is not None:
+            before_replace()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return written
@@ -0,0 +1,145 @@
+import hashlib
+import marshal
+import os
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Optional
+from models import OPTION_LABELS, BIOSSetting, intern
+import nvram_parser
+
+MAGIC = b'SCWC'
+# bump when the entry layout changes, entries with another format are treated as stale
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 1 + 4
+
+
+def default_cache_dir() -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'scewinGUI', 'cache')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'scewin-gui')
+
+
+class ParseCache:
+    """
+    on-disk cache of parsed dumps, keyed by a hash of the file contents, the encoding and the parser version.
+    entries are marshalled, zlib-compressed and checksummed. the cache is kept under `limit_bytes`
+    by evicting the least recently used entries, a hit refreshes an entry's mtime.
+    corrupt or unreadable entries are deleted and reported as a miss so the dump is parsed again.
+    """
+
+    def __init__(self, directory: Optional[str] = None, limit_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.limit_bytes = limit_bytes
+
+    @staticmethod
+    def key(data: bytes, encoding: str) -> str:
+        digest = hashlib.blake2b(data, digest_size=20)
+        digest.update(f"|{encoding}|{nvram_parser.PARSER_VERSION}|{FORMAT_VERSION}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def load(self, key: str) -> Optional[List[BIOSSetting]]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            return None
+        try:
+            settings = self._decode(blob)
+        except Exception as e:
+            print(f"Discarding corrupt parse cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return settings
+
+    def store(self, key: str, rows: List[tuple]):
+        """
+        stores rows made by `snapshot` and evicts old entries if the cache grew past its limit
+        """
+        labels: Dict[int, int] = {}
+        packed = []
+        for row in rows:
+            local_ids = tuple(labels.setdefault(label_id, len(labels)) for label_id in row[6])
+            packed.append(row[:6] + (local_ids,) + row[7:])
+        label_table = tuple(OPTION_LABELS.labels_of(tuple(labels)))
+        payload = zlib.compress(marshal.dumps((label_table, packed)), 1)
+        header = MAGIC + bytes((FORMAT_VERSION,)) + zlib.crc32(payload).to_bytes(4, 'little')
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(header + payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing parse cache entry: {e}")
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.bin'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.limit_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def snapshot(setting: BIOSSetting) -> tuple:
+        """
+        the cached form of a freshly parsed setting, taken before the user can edit it
+        """
+        return (setting.setup_question, setting.help_string, setting.token, setting.offset, setting.width,
+                setting.bios_default, setting.option_ids, setting.active_option, setting.value,
+                setting.content, setting.spans.tobytes())
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[BIOSSetting]:
+        if blob[:len(MAGIC)] != MAGIC or blob[len(MAGIC)] != FORMAT_VERSION:
+            raise ValueError("unknown cache format")
+        payload = blob[HEADER_SIZE:]
+        if zlib.crc32(payload) != int.from_bytes(blob[len(MAGIC) + 1:HEADER_SIZE], 'little'):
+            raise ValueError("checksum mismatch")
+        label_table, packed = marshal.loads(zlib.decompress(payload))
+        label_ids = OPTION_LABELS.ids_of(label_table)
+        settings = []
+        for (question, help_string, token, offset, width, default,
+             local_ids, active, value, content, spans) in packed:
+            # interned like parsed settings, so cached dumps share their strings with the other open dumps
+            setting = BIOSSetting(setup_question=intern(question), help_string=intern(help_string),
+                                  token=intern(token), offset=intern(offset), width=intern(width),
+                                  bios_default=intern(default),
+                                  option_ids=OPTION_LABELS.canonical(tuple(label_ids[i] for i in local_ids)),
+                                  active_option=active, value=intern(value),
+                                  content=tuple(intern(line) for line in content))
+            setting.spans = array('I')
+            setting.spans.frombytes(spans)
+            settings.append(setting)
+        return settings
@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+from typing import Any, Dict, Optional
+
+# registry key older versions kept the theme and custom themes in, read once when there is no preferences file yet
+REGISTRY_KEY = r"SOFTWARE\MyBIOSManager"
+LEGACY_THEMES_FILE = 'custom_themes.json'
+
+
+def default_preferences_path() -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'scewinGUI', 'preferences.json')
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'scewin-gui', 'preferences.json')
+
+
+def _read_legacy() -> Dict[str, Any]:
+    """preferences stored by older versions in the windows registry and custom_themes.json"""
+    values: Dict[str, Any] = {}
+    themes: Dict[str, Any] = {}
+    try:
+        import winreg
+    except ImportError:
+        winreg = None
+    if winreg is not None:
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, REGISTRY_KEY, 0, winreg.KEY_READ) as key:
+                for name in ('current_theme', 'custom_themes'):
+                    try:
+                        data, _ = winreg.QueryValueEx(key, name)
+                    except FileNotFoundError:
+                        continue
+                    if name == 'current_theme':
+                        values['theme'] = data
+                    else:
+                        themes.update(json.loads(data))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading preferences from the registry: {e}")
+    try:
+        if os.path.exists(LEGACY_THEMES_FILE):
+            with open(LEGACY_THEMES_FILE, 'r') as f:
+                themes.update(json.load(f))
+    except Exception as e:
+        print(f"Error reading custom themes from {LEGACY_THEMES_FILE}: {e}")
+    if themes:
+        values['custom_themes'] = themes
+    return values
+
+
+class Preferences:
+    """
+    user preferences kept in a JSON file, read once on startup.
+    changes are written after SAVE_DELAY_MS without further changes when a Tk root is attached,
+    so clicking through themes doesn't write the file on every click. call flush() before exiting.
+    without a root, changes are only written by flush()
+    """
+    SAVE_DELAY_MS = 500
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_preferences_path()
+        self.root = None
+        self._values: Dict[str, Any] = {}
+        self._dirty = False
+        self._save_job: Optional[str] = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                values = json.load(f)
+            if isinstance(values, dict):
+                self._values = values
+                return
+            print(f"Ignoring preferences in {self.path}: not a JSON object")
+        except FileNotFoundError:
+            # first run of this version, keep what older versions stored
+            self._values = _read_legacy()
+            self._dirty = bool(self._values)
+        except Exception as e:
+            print(f"Error loading preferences from {self.path}: {e}")
+
+    def attach(self, root):
+        """writes changes from the Tk event loop of `root` from now on"""
+        self.root = root
+        if self._dirty:
+            self._schedule()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+
+    def set(self, key: str, value: Any):
+        if self._values.get(key) == value and key in self._values:
+            return
+        self._values[key] = value
+        self._dirty = True
+        self._schedule()
+
+    def _schedule(self):
+        if self.root is None:
+            return
+        if self._save_job is not None:
+            self.root.after_cancel(self._save_job)
+        self._save_job = self.root.after(self.SAVE_DELAY_MS, self.flush)
+
+    def flush(self):
+        """writes pending changes now"""
+        self._save_job = None
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._values, f, indent=4)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"Error saving preferences to {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
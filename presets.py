@@ -0,0 +1,150 @@
+import json
+import re
+from dataclasses import dataclass, field, fields
+from typing import Iterable, List, Optional
+from models import BIOSSetting
+from settings_store import SettingsStore
+
+
+@dataclass
+class PresetEntry:
+    """
+    one change of a preset: which settings to select and the option label or value to give them.
+    settings are selected by any combination of question, token and offset, when several settings
+    match, the entry is only applied if `all` is set, otherwise it is reported as ambiguous.
+    """
+    question: Optional[str] = None
+    token: Optional[str] = None
+    offset: Optional[str] = None
+    option: Optional[str] = None
+    value: Optional[str] = None
+    all: bool = False
+
+    def describe(self) -> str:
+        parts = [f"{name}={getattr(self, name)!r}" for name in ('question', 'token', 'offset')
+                 if getattr(self, name) is not None]
+        return ", ".join(parts)
+
+
+@dataclass
+class PresetResult:
+    changed: int = 0
+    unchanged: int = 0
+    # descriptions of the entries that matched nothing, matched several settings or named an unknown option
+    missing: List[str] = field(default_factory=list)
+    ambiguous: List[str] = field(default_factory=list)
+    invalid: List[str] = field(default_factory=list)
+
+
+# fields of a preset entry that hold text, checked when loading so workers don't fail on each dump
+TEXT_FIELDS = ('question', 'token', 'offset', 'option', 'value')
+
+
+def _entry_from(data) -> PresetEntry:
+    if not isinstance(data, dict):
+        raise ValueError(f"preset entry must be a JSON object, got {data!r}")
+    known = {entry_field.name for entry_field in fields(PresetEntry)}
+    for key in data:
+        if key not in known:
+            raise ValueError(f"unknown key {key!r} in preset entry {data!r}, "
+                             f"expected one of {', '.join(sorted(known))}")
+    for name in TEXT_FIELDS:
+        if data.get(name) is not None and not isinstance(data[name], str):
+            raise ValueError(f"{name} of preset entry {data!r} must be a string")
+    if not isinstance(data.get('all', False), bool):
+        raise ValueError(f"all of preset entry {data!r} must be true or false")
+    return PresetEntry(**data)
+
+
+def load_preset(path: str) -> List[PresetEntry]:
+    """
+    reads a preset file, either {"settings": [{"question": ..., "option": ...}, ...]}
+    or a plain {"question": "option label"} mapping
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'settings' in data:
+        if not isinstance(data['settings'], list):
+            raise ValueError("preset settings must be a list of objects")
+        entries = [_entry_from(entry) for entry in data['settings']]
+    elif isinstance(data, dict):
+        entries = [_entry_from({'question': question, 'option': option}) for question, option in data.items()]
+    else:
+        raise ValueError("preset must be a JSON object")
+    for entry in entries:
+        if entry.question is None and entry.token is None and entry.offset is None:
+            raise ValueError("preset entry needs a question, token or offset")
+        if (entry.option is None) == (entry.value is None):
+            raise ValueError(f"preset entry {entry.describe()} needs exactly one of option or value")
+    return entries
+
+
+def select_settings(store: SettingsStore, question: Optional[str] = None, pattern: Optional[str] = None,
+                    token: Optional[str] = None) -> List[BIOSSetting]:
+    """
+    settings whose question equals `question`, matches the regex `pattern` (ignoring case) and/or
+    whose token is `token`, in file order
+    """
+    settings = store.find(question=question, token=token)
+    if pattern is not None:
+        regex = re.compile(pattern, re.IGNORECASE)
+        # many settings share a question, only run the regex once per distinct one
+        seen = {}
+        selected = []
+        for setting in settings:
+            text = setting.setup_question
+            matched = seen.get(text)
+            if matched is None:
+                matched = seen[text] = regex.search(text) is not None
+            if matched:
+                selected.append(setting)
+        settings = selected
+    return settings
+
+
+def set_option(settings: Iterable[BIOSSetting], label: str, result: Optional[PresetResult] = None) -> PresetResult:
+    """
+    activates the option called `label` on every setting in one pass, marking changed settings dirty.
+    settings without such an option are reported as invalid
+    """
+    result = result if result is not None else PresetResult()
+    key = label.strip().lower()
+    for setting in settings:
+        index = setting.option_index(key)
+        if index is None:
+            result.invalid.append(f"{setting.setup_question.strip()} [{setting.token.strip()}]: no option {label!r}")
+        elif setting.active_option == index:
+            result.unchanged += 1
+        else:
+            setting.active_option = index
+            setting.dirty = True
+            result.changed += 1
+    return result
+
+
+def apply_preset(store: SettingsStore, entries: List[PresetEntry]) -> PresetResult:
+    """
+    applies every entry to the settings in `store`, marking changed settings dirty
+    """
+    result = PresetResult()
+    for entry in entries:
+        matches = store.find(question=entry.question, token=entry.token, offset=entry.offset)
+        if not matches:
+            result.missing.append(entry.describe())
+            continue
+        if len(matches) > 1 and not entry.all:
+            result.ambiguous.append(entry.describe())
+            continue
+        if entry.option is not None:
+            set_option(matches, entry.option, result)
+            continue
+        for setting in matches:
+            if setting.options or setting.value is None:
+                result.invalid.append(f"{entry.describe()}: setting has no value")
+            elif setting.value == entry.value:
+                result.unchanged += 1
+            else:
+                setting.value = entry.value
+                setting.dirty = True
+                result.changed += 1
+    return result
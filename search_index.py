@@ -0,0 +1,186 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models import BIOSSetting, intern
+
+# searchable fields, and the prefixes accepted for field-qualified queries like "token:1A"
+FIELDS = ('question', 'help', 'token', 'offset', 'opt')
+FIELD_PREFIXES = {
+    'q': 'question',
+    'question': 'question',
+    'help': 'help',
+    'token': 'token',
+    'tok': 'token',
+    'offset': 'offset',
+    'off': 'offset',
+    'opt': 'opt',
+    'option': 'opt',
+    'options': 'opt',
+}
+RE_FIELD_PREFIX = re.compile(r'(?:^|\s)(' + '|'.join(sorted(FIELD_PREFIXES, key=len, reverse=True)) + r'):', re.IGNORECASE)
+
+RE_WORD = re.compile(r'[0-9a-z]+')
+
+# word fragments shorter than this match too much of the vocabulary to be worth a lookup
+MIN_FRAGMENT = 2
+# fragments whose documents are kept between searches, every prefix typed into the search box adds one
+MAX_CACHED_FRAGMENTS = 1024
+
+
+def parse_query(query: str) -> List[Tuple[Optional[str], str]]:
+    """
+    splits a query into (field, phrase) terms, field is None for text that should match any field.
+    "cpu token:0x1A opt:disabled" -> [(None, 'cpu'), ('token', '1a'), ('opt', 'disabled')]
+    """
+    terms = []
+    matches = list(RE_FIELD_PREFIX.finditer(query))
+    head = query[:matches[0].start()] if matches else query
+    if head.strip():
+        terms.append((None, head.strip().lower()))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(query)
+        field = FIELD_PREFIXES[match.group(1).lower()]
+        phrase = query[match.end():end].strip().lower()
+        if field in ('token', 'offset') and phrase.startswith('0x'):
+            phrase = phrase[2:]
+        if phrase:
+            terms.append((field, phrase))
+    return terms
+
+
+class SearchIndex:
+    """
+    search index over the settings of a dump, built once while the dump is loaded.
+    keeps a lowercased copy of every searchable field plus a word -> documents inverted index.
+    the copies are interned, so the help texts repeated within and across open dumps are stored once,
+    and the documents of a word are kept as a sorted array of ints rather than a set.
+    a phrase is looked up by finding the vocabulary words that contain each of its word fragments,
+    so only the documents holding all fragments are verified against the cached text.
+    the documents of a fragment are found by one vocabulary scan and then kept up to date as documents
+    are added or updated, so typing while a dump loads or lazy settings are decoded doesn't rescan.
+    documents are numbered in the order they were added, the same way SettingsStore numbers its ids.
+    """
+
+    def __init__(self):
+        self._texts: Dict[str, List[str]] = {field: [] for field in FIELDS}
+        self._postings: Dict[str, array] = {}
+        self._fragment_cache: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._texts['question'])
+
+    def clear(self):
+        for texts in self._texts.values():
+            texts.clear()
+        self._postings.clear()
+        self._fragment_cache.clear()
+
+    def add(self, setting: BIOSSetting) -> int:
+        doc = len(self)
+        fields = self._fields(setting)
+        for field, text in zip(FIELDS, fields):
+            self._texts[field].append(text)
+        self._index_words(doc, fields)
+        return doc
+
+    @staticmethod
+    def _fields(setting: BIOSSetting) -> Tuple[str, ...]:
+        return (
+            intern(setting.setup_question.lower()),
+            intern(setting.help_string.lower()),
+            intern(setting.token.lower()),
+            intern(setting.offset.lower()),
+            intern("\n".join(setting.options).lower()),
+        )
+
+    def _index_words(self, doc: int, fields: Tuple[str, ...]):
+        postings = self._postings
+        text = "\n".join(fields)
+        # fragments are runs of word characters, so one found in the text lies within one of its words
+        for fragment, docs in self._fragment_cache.items():
+            if fragment in text:
+                docs.add(doc)
+        for word in set(RE_WORD.findall(text)):
+            docs = postings.get(word)
+            if docs is None:
+                postings[word] = array('I', (doc,))
+            elif docs[-1] < doc:
+                docs.append(doc)
+            else:
+                # a document indexed again by update()
+                position = bisect_left(docs, doc)
+                if position == len(docs) or docs[position] != doc:
+                    docs.insert(position, doc)
+
+    def update(self, setting: BIOSSetting):
+        """
+        re-indexes a setting whose fields were filled in after it was added, e.g. a lazily loaded one.
+        words that no longer occur are left in the postings, the text check filters them out.
+        """
+        doc = setting.sid
+        fields = self._fields(setting)
+        for field, text in zip(FIELDS, fields):
+            self._texts[field][doc] = text
+        self._index_words(doc, fields)
+
+    def add_all(self, settings: Iterable[BIOSSetting]):
+        for setting in settings:
+            self.add(setting)
+
+    def _fragment_docs(self, fragment: str) -> Set[int]:
+        docs = self._fragment_cache.get(fragment)
+        if docs is None:
+            if len(self._fragment_cache) >= MAX_CACHED_FRAGMENTS:
+                self._fragment_cache.clear()
+            docs = set()
+            for word, word_docs in self._postings.items():
+                if fragment in word:
+                    docs.update(word_docs)
+            self._fragment_cache[fragment] = docs
+        return docs
+
+    def _candidates(self, phrase: str) -> Optional[Set[int]]:
+        # None means the phrase has no usable fragment and every document is a candidate
+        fragments = sorted({f for f in RE_WORD.findall(phrase) if len(f) >= MIN_FRAGMENT}, key=len, reverse=True)
+        result = None
+        for fragment in fragments:
+            docs = self._fragment_docs(fragment)
+            result = docs if result is None else result & docs
+            if not result:
+                break
+        return result
+
+    def _matches(self, doc: int, field: Optional[str], phrase: str) -> bool:
+        if field is not None:
+            return phrase in self._texts[field][doc]
+        return any(phrase in self._texts[f][doc] for f in FIELDS)
+
+    def matches(self, doc: int, terms: List[Tuple[Optional[str], str]]) -> bool:
+        """
+        checks a single document against already parsed query terms, used for rows added while loading
+        """
+        return all(self._matches(doc, field, phrase) for field, phrase in terms)
+
+    def search(self, query: str) -> Optional[Set[int]]:
+        """
+        returns the documents matching every term of the query, or None if the query is empty
+        """
+        return self.search_terms(parse_query(query))
+
+    def search_terms(self, terms: List[Tuple[Optional[str], str]]) -> Optional[Set[int]]:
+        """
+        search() for already parsed query terms
+        """
+        if not terms:
+            return None
+        # narrow down with the indexed fragments first, then verify every term on the cached text
+        result = None
+        for field, phrase in terms:
+            candidates = self._candidates(phrase)
+            if candidates is None:
+                continue
+            result = candidates if result is None else result & candidates
+        if result is None:
+            result = range(len(self))
+        return {doc for doc in result if self.matches(doc, terms)}
@@ -0,0 +1,109 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+from models import BIOSSetting, intern
+
+
+def normalize_hex(text: str) -> str:
+    """
+    normalizes a token or offset so "0x001A", "001a" and "1A" all compare equal
+    """
+    text = text.strip().lower()
+    if text.startswith('0x'):
+        text = text[2:]
+    return text.lstrip('0') or '0'
+
+
+def normalize_question(text: str) -> str:
+    return ' '.join(text.split()).lower()
+
+
+class SettingsStore:
+    """
+    holds the settings of one dump in file order.
+    every setting gets a stable integer id (its position) so duplicate question/token/offset
+    triples stay distinct, and hash indexes by token, offset, question and key make lookups O(1).
+    """
+
+    def __init__(self, settings: Iterable[BIOSSetting] = ()):
+        self._settings: List[BIOSSetting] = []
+        self._by_token: Dict[str, List[int]] = {}
+        self._by_offset: Dict[str, List[int]] = {}
+        self._by_question: Dict[str, List[int]] = {}
+        self._by_key: Dict[tuple, List[int]] = {}
+        self.extend(settings)
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+    def __iter__(self) -> Iterator[BIOSSetting]:
+        return iter(self._settings)
+
+    def __getitem__(self, sid: int) -> BIOSSetting:
+        return self._settings[sid]
+
+    def get(self, sid: int) -> Optional[BIOSSetting]:
+        if 0 <= sid < len(self._settings):
+            return self._settings[sid]
+        return None
+
+    def add(self, setting: BIOSSetting) -> int:
+        sid = len(self._settings)
+        setting.sid = sid
+        self._settings.append(setting)
+        # interned, the same keys repeat across the open dumps
+        token = intern(normalize_hex(setting.token))
+        offset = intern(normalize_hex(setting.offset))
+        question = intern(normalize_question(setting.setup_question))
+        self._by_token.setdefault(token, []).append(sid)
+        self._by_offset.setdefault(offset, []).append(sid)
+        self._by_question.setdefault(question, []).append(sid)
+        self._by_key.setdefault((question, token, offset), []).append(sid)
+        return sid
+
+    def extend(self, settings: Iterable[BIOSSetting]):
+        for setting in settings:
+            self.add(setting)
+
+    def clear(self):
+        self._settings.clear()
+        self._by_token.clear()
+        self._by_offset.clear()
+        self._by_question.clear()
+        self._by_key.clear()
+
+    def _lookup(self, index: Dict, key) -> List[BIOSSetting]:
+        return [self._settings[sid] for sid in index.get(key, ())]
+
+    def by_token(self, token: str) -> List[BIOSSetting]:
+        return self._lookup(self._by_token, normalize_hex(token))
+
+    def by_offset(self, offset: str) -> List[BIOSSetting]:
+        return self._lookup(self._by_offset, normalize_hex(offset))
+
+    def by_question(self, question: str) -> List[BIOSSetting]:
+        """exact question match, ignoring case and repeated whitespace"""
+        return self._lookup(self._by_question, normalize_question(question))
+
+    def by_key(self, question: str, token: str, offset: str) -> List[BIOSSetting]:
+        key = (normalize_question(question), normalize_hex(token), normalize_hex(offset))
+        return self._lookup(self._by_key, key)
+
+    def find(self, question: Optional[str] = None, token: Optional[str] = None,
+             offset: Optional[str] = None) -> List[BIOSSetting]:
+        """
+        returns the settings matching every given field, in file order
+        """
+        candidates = None
+        for index, key, normalize in ((self._by_question, question, normalize_question),
+                                      (self._by_token, token, normalize_hex),
+                                      (self._by_offset, offset, normalize_hex)):
+            if key is None:
+                continue
+            sids = set(index.get(normalize(key), ()))
+            candidates = sids if candidates is None else candidates & sids
+        if candidates is None:
+            return list(self._settings)
+        return [self._settings[sid] for sid in sorted(candidates)]
+
+    def duplicates(self) -> List[List[BIOSSetting]]:
+        """groups of settings sharing the same question/token/offset triple"""
+        return [[self._settings[sid] for sid in sids] for sids in self._by_key.values() if len(sids) > 1]
@@ -1,9 +1,14 @@
-import json
-import os
-import winreg
+from typing import Dict, List, Optional, Tuple
+from preferences import Preferences
+
+BUILTIN_THEMES = ('Light', 'Dark')
+# (style, configure options, map options) as passed to ttk.Style
+StyleSettings = List[Tuple[str, Dict[str, str], Dict[str, list]]]
+
 
 class ThemeManager:
-    def __init__(self):
+    def __init__(self, preferences: Optional[Preferences] = None):
+        self.preferences = preferences if preferences is not None else Preferences()
         self.themes = {
             'Light': {
                 'bg': '#ffffff',
@@ -33,46 +38,64 @@ class ThemeManager:
             }
         }
         self.current_theme = 'Light'
+        # compiled ttk style settings per theme, built the first time a theme is applied
+        self._styles: Dict[str, StyleSettings] = {}
         self.load_custom_themes()
+        theme_name = self.preferences.get('theme')
+        if theme_name in self.themes:
+            self.current_theme = theme_name
 
     def load_custom_themes(self):
         """
-        tries to load custom themes from the registry and a local JSON file.
+        loads the custom themes from the preferences
         """
-        try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\MyBIOSManager", 0, winreg.KEY_READ) as key:
-                themes_json, _ = winreg.QueryValueEx(key, "custom_themes")
-                custom_themes = json.loads(themes_json)
-                self.themes.update(custom_themes)
-        except FileNotFoundError:
-            pass
-        except Exception as e:
-            print(f"Error loading custom themes from registry: {e}")
-
-        try:
-            if os.path.exists('custom_themes.json'):
-                with open('custom_themes.json', 'r') as f:
-                    file_themes = json.load(f)
-                    self.themes.update(file_themes)
-        except Exception as e:
-            print(f"Error loading custom themes from JSON file: {e}")
+        custom_themes = self.preferences.get('custom_themes', {})
+        if isinstance(custom_themes, dict):
+            self.themes.update(custom_themes)
+        self._styles.clear()
 
     def save_custom_themes(self):
         """
-        save custom themes to the registry and a local JSON file.
+        stores the custom themes in the preferences, written shortly after
         """
-        try:
-            custom_themes = {k: v for k, v in self.themes.items() if k not in ['Light', 'Dark']}
-            try:
-                with winreg.CreateKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\MyBIOSManager") as key:
-                    json_str = json.dumps(custom_themes, indent=4)
-                    winreg.SetValueEx(key, "custom_themes", 0, winreg.REG_SZ, json_str)
-            except Exception as e:
-                print(f"Error saving custom themes to registry: {e}")
-            try:
-                with open('custom_themes.json', 'w') as f:
-                    json.dump(custom_themes, f, indent=4)
-            except Exception as e:
-                print(f"Error saving custom themes to JSON file: {e}")
-        except Exception as e:
-            print(f"Error preparing custom themes for save: {e}")
+        custom_themes = {k: v for k, v in self.themes.items() if k not in BUILTIN_THEMES}
+        self.preferences.set('custom_themes', custom_themes)
+        self._styles.clear()
+
+    def select(self, theme_name: str):
+        self.current_theme = theme_name
+        self.preferences.set('theme', theme_name)
+
+    def colors(self, theme_name: str) -> Dict[str, str]:
+        # themes made in the theme editor only have some of the colors, the rest come from Light
+        return {**self.themes['Light'], **self.themes[theme_name]}
+
+    def style_settings(self, theme_name: str) -> StyleSettings:
+        """the ttk style options of a theme, computed once per theme"""
+        settings = self._styles.get(theme_name)
+        if settings is not None:
+            return settings
+        theme = self.colors(theme_name)
+        settings = [
+            ('.', dict(background=theme['bg'],
+                       foreground=theme['fg'],
+                       fieldbackground=theme['inputbg'],
+                       troughcolor=theme['bg'],
+                       selectbackground=theme['selectbg'],
+                       selectforeground=theme['selectfg']), {}),
+            ('TFrame', dict(background=theme['framebg']), {}),
+            ('TLabelframe', dict(background=theme['framebg']), {}),
+            ('TLabelframe.Label', dict(background=theme['framebg'], foreground=theme['fg']), {}),
+            ('TButton', dict(background=theme['buttonbg'], foreground=theme['buttonfg'],
+                             bordercolor=theme['buttonbg']), {}),
+            ('TEntry', dict(fieldbackground=theme['inputbg'], foreground=theme['inputfg']), {}),
+            ('Treeview', dict(background=theme['bg'], foreground=theme['fg'], fieldbackground=theme['bg']),
+             dict(background=[('selected', theme['selectbg'])], foreground=[('selected', theme['selectfg'])])),
+            ('Treeview.Heading', dict(background=theme['buttonbg'], foreground=theme['buttonfg']), {}),
+            ('TLabel', dict(background=theme['framebg'], foreground=theme['fg']), {}),
+            ('TRadiobutton', dict(background=theme['framebg'], foreground=theme['fg']), {}),
+            ('TCombobox', dict(fieldbackground=theme['inputbg'], foreground=theme['inputfg'],
+                               background=theme['buttonbg']), {}),
+        ]
+        self._styles[theme_name] = settings
+        return settings
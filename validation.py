@@ -0,0 +1,125 @@
+"""
+checks the settings of a dump before it is saved or imported with SCEWIN: values that don't fit their
+width, active options out of range, malformed widths, tokens and offsets, and settings sharing a key
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from settings_store import SettingsStore
+
+# an error makes SCEWIN reject the file or write something else than shown, a warning is worth a look
+ERROR = 'error'
+WARNING = 'warning'
+
+# what a Value field holds once parsed
+NUMBER, STRING, INVALID, OTHER = range(4)
+
+# parsed width, token and offset fields by their text. dumps share a handful of widths and the
+# field strings are interned, so the lookup is all most settings cost
+_hex_cache: Dict[str, Optional[int]] = {}
+_value_cache: Dict[str, Tuple[int, int]] = {}
+
+
+@dataclass
+class Problem:
+    sid: int
+    key: Tuple[str, str, str]
+    severity: str
+    message: str
+
+
+def parse_hex(text: str) -> Optional[int]:
+    """a Width, Token or Offset field such as "01", "1A" or "0x1A", None if it is not hex"""
+    number = _hex_cache.get(text, -1)
+    if number == -1:
+        try:
+            number = int(text, 16)
+        except ValueError:
+            number = None
+        else:
+            if number < 0:
+                number = None
+        _hex_cache[text] = number
+    return number
+
+
+def parse_value(text: str) -> Tuple[int, int]:
+    """
+    (kind, number) of a Value field: NUMBER with the number of "<12>" or "<0x0C>", STRING with the
+    length of a quoted string, INVALID for a bracketed value that isn't a number and OTHER for anything else
+    """
+    parsed = _value_cache.get(text)
+    if parsed is None:
+        stripped = text.strip()
+        if stripped.startswith('<') and stripped.endswith('>'):
+            inner = stripped[1:-1].strip()
+            try:
+                number = int(inner, 16) if inner[:2].lower() == '0x' else int(inner)
+                parsed = (NUMBER, number)
+            except ValueError:
+                parsed = (INVALID, 0)
+        elif len(stripped) >= 2 and stripped[0] == stripped[-1] == '"':
+            parsed = (STRING, len(stripped) - 2)
+        else:
+            parsed = (OTHER, 0)
+        # user typed values are not interned, keep the cache from growing without bound
+        if len(_value_cache) < 1 << 16:
+            _value_cache[text] = parsed
+    return parsed
+
+
+def validate(store: SettingsStore) -> List[Problem]:
+    """
+    checks every setting of `store` in one pass, returns the problems in file order.
+    lazily loaded settings that were never decoded are unedited, only their key and token are checked
+    """
+    problems: List[Problem] = []
+    add = problems.append
+    for setting in store:
+        lazy = setting.preview is not None
+        token = setting.token
+        if token and parse_hex(token) is None:
+            add(Problem(setting.sid, setting.key, WARNING, f"Token {token!r} is not a hex number"))
+        if lazy:
+            continue
+        offset = setting.offset
+        if offset and parse_hex(offset) is None:
+            add(Problem(setting.sid, setting.key, WARNING, f"Offset {offset!r} is not a hex number"))
+
+        option_count = len(setting.option_ids)
+        active = setting.active_option
+        if option_count:
+            if active is None:
+                add(Problem(setting.sid, setting.key, WARNING, "No option is selected"))
+            elif not 0 <= active < option_count:
+                add(Problem(setting.sid, setting.key, ERROR,
+                            f"Selected option {active} is out of range, there are {option_count} options"))
+
+        width_text = setting.width
+        width = parse_hex(width_text) if width_text else None
+        if width_text and width is None:
+            add(Problem(setting.sid, setting.key, ERROR, f"Width {width_text!r} is not a hex number"))
+        value = setting.value
+        if value is None or option_count:
+            continue
+        kind, number = parse_value(value)
+        if kind == INVALID:
+            add(Problem(setting.sid, setting.key, ERROR, f"Value {value!r} is not a number"))
+        elif width is None:
+            continue
+        elif kind == NUMBER and not 0 <= number < 1 << (8 * width):
+            add(Problem(setting.sid, setting.key, ERROR, f"Value {number} does not fit in {width} bytes"))
+        elif kind == STRING and number > width:
+            add(Problem(setting.sid, setting.key, ERROR,
+                        f"Value is {number} characters long, Width allows {width}"))
+
+    # saving keeps every setting, but presets, diffs and the fleet database can't tell these apart
+    for group in store.duplicates():
+        for setting in group:
+            add(Problem(setting.sid, setting.key, WARNING,
+                        f"{len(group)} settings share this question, token and offset"))
+    problems.sort(key=lambda problem: problem.sid)
+    return problems
+
+
+def count(problems: List[Problem], severity: str) -> int:
+    return sum(problem.severity == severity for problem in problems)
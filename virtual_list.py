@@ -0,0 +1,187 @@
+import sys
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import font as tkfont
+from tkinter import ttk
+from typing import AbstractSet, Callable, Dict, Optional, Sequence, Tuple
+
+
+class VirtualList(ttk.Frame):
+    """
+    a single-selection list drawn with a Treeview that only holds rows for the visible part plus a small buffer.
+    the list shows `keys`, a sequence of ints (e.g. the store ids matching the filter, a range for all of them,
+    or ids in rank order), and asks `render(key)` for the (text, values) of a row only when it scrolls into view,
+    so filling, scrolling and filtering cost the same for 1k or 100k settings.
+    `on_select(key)` is called when the user selects a row, keys passed to `mark` are drawn with the 'marked' tag.
+    """
+
+    def __init__(self, master, render: Callable[[int], Tuple[str, tuple]], columns: Tuple[str, ...] = ('value',),
+                 on_select: Optional[Callable[[int], None]] = None, buffer: int = 5):
+        super().__init__(master)
+        self.render = render
+        self.on_select = on_select
+        self.buffer = buffer
+        self.keys: Sequence[int] = ()
+        # key -> index for keys that are not in ascending order, ascending ones are found by bisection
+        self._positions: Optional[Dict[int, int]] = None
+        # index of the first shown key and the key of the selected row
+        self.top = 0
+        self.selected: Optional[int] = None
+        self.marked: AbstractSet[int] = frozenset()
+        self._slots = 0
+        self.tree = ttk.Treeview(self, columns=columns, show='tree', selectmode='browse')
+        self.tree.tag_configure('marked', foreground='#d9534f')
+        self.tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<Button-1>', self._on_click)
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda event: self._scroll(-3))
+        self.tree.bind('<Button-5>', lambda event: self._scroll(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'), ('<Next>', 'page_down'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda event, step=step: self._on_key(step))
+
+    @property
+    def page(self) -> int:
+        """number of rows that fit in the viewport"""
+        return max(self._slots - self.buffer, 1)
+
+    def _row_height(self) -> int:
+        height = ttk.Style().lookup('Treeview', 'rowheight')
+        try:
+            return max(int(height), 1)
+        except (TypeError, ValueError):
+            # the default theme sizes rows by the font
+            return tkfont.nametofont('TkDefaultFont').metrics('linespace') + 2
+
+    def _on_resize(self, event):
+        slots = event.height // self._row_height() + self.buffer
+        if slots != self._slots:
+            children = self.tree.get_children()
+            for slot in range(len(children), slots):
+                self.tree.insert('', 'end', iid=str(slot))
+            self.tree.delete(*children[slots:])
+            self._slots = slots
+        self._draw()
+
+    def set_keys(self, keys: Sequence[int], ascending: bool = True):
+        """
+        shows a new set of keys, keeping the selected key in view if it is still there
+        """
+        self.keys = keys
+        self._positions = None if ascending else {key: index for index, key in enumerate(keys)}
+        index = self.index_of(self.selected) if self.selected is not None else None
+        if index is not None and not self.top <= index < self.top + self.page:
+            self.top = index - self.page // 2
+        self._draw()
+
+    def index_of(self, key: int) -> Optional[int]:
+        if self._positions is not None:
+            return self._positions.get(key)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return None
+
+    def refresh(self, key: Optional[int] = None):
+        """re-renders the row of `key` if it is shown, or every shown row"""
+        if key is None:
+            self._draw()
+            return
+        index = self.index_of(key)
+        if index is not None and self.top <= index < self.top + self._slots:
+            text, values = self.render(key)
+            self.tree.item(str(index - self.top), text=text, values=values,
+                           tags=('marked',) if key in self.marked else ())
+
+    def mark(self, keys: AbstractSet[int]):
+        """highlights the rows of `keys`, e.g. settings with problems, replacing the earlier marks"""
+        self.marked = keys
+        self._draw()
+
+    def selection(self) -> Optional[int]:
+        return self.selected
+
+    def select(self, key: Optional[int], notify: bool = False):
+        """selects `key` and scrolls it into view"""
+        self.selected = key
+        index = self.index_of(key) if key is not None else None
+        if index is not None:
+            if index < self.top:
+                self.top = index
+            elif index >= self.top + self.page:
+                self.top = index - self.page + 1
+        self._draw()
+        if notify and key is not None and self.on_select is not None:
+            self.on_select(key)
+
+    def _draw(self):
+        count = len(self.keys)
+        self.top = max(0, min(self.top, count - self.page))
+        tree = self.tree
+        selected_slot = None
+        for slot in range(self._slots):
+            iid = str(slot)
+            index = self.top + slot
+            if index < count:
+                key = self.keys[index]
+                text, values = self.render(key)
+                tree.item(iid, text=text, values=values, tags=('marked',) if key in self.marked else ())
+                if key == self.selected:
+                    selected_slot = iid
+            else:
+                tree.item(iid, text="", values=(), tags=())
+        tree.selection_set(selected_slot if selected_slot is not None else ())
+        if count:
+            self.scrollbar.set(self.top / count, min((self.top + self.page) / count, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """scrollbar callback"""
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.keys))
+            self._draw()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self._scroll(amount * self.page if args[2] == 'pages' else amount)
+
+    def _scroll(self, rows: int):
+        self.top += rows
+        self._draw()
+
+    def _on_wheel(self, event):
+        # windows reports 120 per notch, macos one per step
+        notches = event.delta / 120 if sys.platform == 'win32' else event.delta
+        self._scroll(-round(notches * 3) or (-1 if event.delta > 0 else 1))
+        return "break"
+
+    def _on_click(self, event):
+        slot = self.tree.identify_row(event.y)
+        self.tree.focus_set()
+        if slot and self.top + int(slot) < len(self.keys):
+            self.select(self.keys[self.top + int(slot)], notify=True)
+        return "break"
+
+    def _on_key(self, step):
+        if not self.keys:
+            return "break"
+        index = self.index_of(self.selected) if self.selected is not None else None
+        if step == 'home':
+            index = 0
+        elif step == 'end':
+            index = len(self.keys) - 1
+        elif index is None:
+            index = self.top
+        elif step == 'page_up':
+            index -= self.page
+        elif step == 'page_down':
+            index += self.page
+        else:
+            index += step
+        index = max(0, min(index, len(self.keys) - 1))
+        self.select(self.keys[index], notify=True)
+        return "break"